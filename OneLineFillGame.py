@@ -14,10 +14,13 @@ Date: 2024-05-01
 '''
 
 import pygame
+import os
 import sys
-import numpy as np
-import json
-import copy
+import time
+from collections import deque, OrderedDict
+from functools import lru_cache
+
+from onelinefill import FILLED, BLOCKED, load_levels, PlayState, HintEngine, SolverProcess, Prefetcher, moves_to_path, star_times, RecordStore, batch_main
 
 def draw_text(text, font, color, surface, x, y):
     '''
@@ -34,39 +37,130 @@ def draw_text(text, font, color, surface, x, y):
     *** Returns ***
         None
     '''
-    text_obj = font.render(text, True, color)
+    text_obj = render_text(text, font, color)
     text_rect = text_obj.get_rect()
     text_rect.center = (x, y)
     surface.blit(text_obj, text_rect)
+
+@lru_cache(maxsize=256)
+def render_text(text, font, color):
+    '''Render text once and reuse the surface, the labels are the same on every frame'''
+    return font.render(text, True, color)
+
+# Cached surfaces of the parts of the screens that never change, the least recently used are dropped
+static_layers = OrderedDict()
+STATIC_LAYER_CAPACITY = 8
+
+def static_layer(name, draw):
+    '''
+    Get the cached surface of the static part of a screen, drawing it the first time
+    
+    *** Parameters ***
+        name: str - The name of the layer
+        draw: function - Draws the layer on the surface given as its argument
+    
+    *** Returns ***
+        layer: pygame.Surface - The surface of the layer
+    '''
+    if name not in static_layers:
+        layer = pygame.Surface(SCREEN_SIZE)
+        layer.fill(WHITE)
+        draw(layer)
+        static_layers[name] = layer
+        if len(static_layers) > STATIC_LAYER_CAPACITY:
+            static_layers.popitem(last=False)
+    static_layers.move_to_end(name)
+    return static_layers[name]
+
+def draw_button(surface, rect, color, text):
+    '''Draw a rounded button with its label at the center'''
+    pygame.draw.rect(surface, color, rect, border_radius=20)
+    draw_text(text, button_font, BLACK, surface, rect.centerx, rect.centery)
     
 def load_game_data():
-    '''Load game data from file'''
-    try:
-        with open('game_data.json', 'r') as file:
-            return json.load(file)
-    except FileNotFoundError:
+    '''Load game data from file, with the records of a session that ended before saving them'''
+    data = record_store.load()
+    if record_store.corrupt_path is not None:
+        print(f"Game data is corrupted, it was moved to {record_store.corrupt_path}.")
+    elif not data:
         print("No previous game data found.")
-        return {}
-    except json.JSONDecodeError:
-        print("Game data is corrupted.")
-        return {}
-        
-def save_game_data(data):
+    return data
+
+def save_game_data(level, record):
     '''
-    Save game data(records) to file
+    Save the record of a level, it is written to the file in the background
     
     *** Parameters ***
-        data: dict - The game data to be saved
+        level: int - The level
+        record: dict - The completion time and stars of the level
     
     *** Returns ***
         None
     '''
-    if data:
-        with open('game_data.json', 'w') as file:
-            json.dump(data, file, indent=4)
-        print("Game data saved successfully.")
-    else:
-        print("No game data to save.")
+    record_store.put(str(level), record)
+
+class FrameScheduler:
+    '''
+    Paces the loops of the screens.
+    While nothing moves on the screen the loop sleeps until the next event; while something is
+    animated the loop runs at most fps times per second. The time spent on each frame is recorded.
+    
+    *** Parameters ***
+        fps: int - The maximum frame rate of animations
+        history: int - The number of recent frame times that are kept
+    '''
+    def __init__(self, fps=60, history=300):
+        self.fps = fps
+        self.clock = pygame.time.Clock()
+        self.animating = False
+        self.frame_times = deque(maxlen=history)
+        self.frames = 0
+        self.frame_start = None
+
+    def events(self):
+        '''
+        Wait for the next frame and get its events
+        
+        *** Returns ***
+            events: list - The events of the frame
+        '''
+        if self.frame_start is not None:
+            # The work done since the last frame, without the time spent waiting
+            self.frame_times.append(time.perf_counter() - self.frame_start)
+        if self.animating:
+            self.clock.tick(self.fps)
+            events = pygame.event.get()
+        else:
+            # Sleep until something happens
+            events = [pygame.event.wait()] + pygame.event.get()
+            events = [event for event in events if event.type != pygame.NOEVENT]
+        self.frame_start = time.perf_counter()
+        self.frames += 1
+        return events
+
+    def stats(self):
+        '''
+        Get the statistics of the recent frame times
+        
+        *** Returns ***
+            stats: dict - The number of frames, and the mean and maximum frame time in ms
+        '''
+        times = self.frame_times
+        return {
+            'frames': self.frames,
+            'mean_ms': 1000 * sum(times) / len(times) if times else 0.0,
+            'max_ms': 1000 * max(times) if times else 0.0,
+        }
+
+def quit_game():
+    '''Close the window and exit, printing the frame time statistics'''
+    stats = scheduler.stats()
+    print(f"Frames: {stats['frames']}, frame time: {stats['mean_ms']:.2f} ms mean, {stats['max_ms']:.2f} ms max.")
+    # Write the last records and merge the journal into the game data file
+    record_store.close()
+    prefetcher.close()
+    pygame.quit()
+    sys.exit()
 
 def draw_slider(volume):
     '''
@@ -103,645 +197,706 @@ def adjust_volume(x):
     button_sound.set_volume(volume)
     return volume
 
-def main_menu():
-    """Main menu of the game"""
-    dragging = False  # Whether the knob is being dragged
-    global global_volume  
-    while True:
-        screen.fill(WHITE)
-        draw_text("One Line Fill Puzzle", title_font, PURPLE, screen, SCREEN_WIDTH // 2, SCREEN_HEIGHT // 4)
+class Scene:
+    '''
+    A screen of the game. Screens are kept on a stack and driven by run_scenes(), so going
+    to another screen never calls into it from inside the loop of the current one.
+    handle() returns None to stay on the screen, or a navigation command:
+        ('push', scene) - open a screen on top of this one
+        ('pop', None) - close this screen and go back to the one below
+        ('replace', scene) - close this screen and open another one instead
+    '''
+    # Whether the screen is animated and needs frames without events
+    animating = False
 
-        # Draw buttons
-        start_button = pygame.Rect(SCREEN_WIDTH // 2 - BUTTON_WIDTH // 2, SCREEN_HEIGHT // 2 - BUTTON_HEIGHT // 2 - 50, BUTTON_WIDTH, BUTTON_HEIGHT)
-        rules_button = pygame.Rect(SCREEN_WIDTH // 2 - BUTTON_WIDTH // 2, SCREEN_HEIGHT // 2 - BUTTON_HEIGHT // 2 + 50, BUTTON_WIDTH, BUTTON_HEIGHT)
-        quit_button = pygame.Rect(SCREEN_WIDTH // 2 - BUTTON_WIDTH // 2, SCREEN_HEIGHT // 2 - BUTTON_HEIGHT // 2 + 150, BUTTON_WIDTH, BUTTON_HEIGHT)
-        pygame.draw.rect(screen, LIGHT_PINK, start_button, border_radius=20)
-        pygame.draw.rect(screen, LIGHT_PINK, rules_button, border_radius=20)
-        pygame.draw.rect(screen, LIGHT_PINK, quit_button, border_radius=20)
-        draw_text("Start", button_font, BLACK, screen, SCREEN_WIDTH // 2, SCREEN_HEIGHT // 2 - 50)
-        draw_text("Rules", button_font, BLACK, screen, SCREEN_WIDTH // 2, SCREEN_HEIGHT // 2 + 50)
-        draw_text("Quit", button_font, BLACK, screen, SCREEN_WIDTH // 2, SCREEN_HEIGHT // 2 + 150)
+    def draw(self):
+        '''Draw the whole screen, when it is opened or shown again'''
+
+    def handle(self, event):
+        '''Handle an event, return a navigation command or None'''
+        return None
 
+    def update(self):
+        '''Called once per frame after the events, return a navigation command or None'''
+        return None
+
+def run_scenes(scene):
+    '''
+    Run the game from one loop over a stack of screens
+    
+    *** Parameters ***
+        scene: Scene - The first screen
+    
+    *** Returns ***
+        None
+    '''
+    global current_music
+    stack = [scene]
+    scene.draw()
+    while stack:
+        scene = stack[-1]
+        scheduler.animating = scene.animating
+        command = None
+        for event in scheduler.events():
+            if event.type == pygame.QUIT:
+                quit_game()
+            elif event.type == MUSIC_END and current_music == 'congrats':
+                # If the congrats music ends, play the background music
+                pygame.time.wait(500)
+                pygame.mixer.music.load(bg_music)
+                pygame.mixer.music.play(-1)
+                current_music = 'bg'
+            else:
+                command = scene.handle(event)
+                if command:
+                    # The rest of the events belong to the old screen
+                    break
+        if not command:
+            command = scene.update()
+        if not command:
+            continue
+
+        action, new_scene = command
+        if action in ('pop', 'replace'):
+            stack.pop()
+        if action in ('push', 'replace'):
+            stack.append(new_scene)
+        if stack:
+            stack[-1].draw()
+
+class MainMenu(Scene):
+    """Main menu of the game"""
+    def __init__(self):
+        self.dragging = False  # Whether the knob is being dragged
+        self.start_button = pygame.Rect(SCREEN_WIDTH // 2 - BUTTON_WIDTH // 2, SCREEN_HEIGHT // 2 - BUTTON_HEIGHT // 2 - 50, BUTTON_WIDTH, BUTTON_HEIGHT)
+        self.rules_button = pygame.Rect(SCREEN_WIDTH // 2 - BUTTON_WIDTH // 2, SCREEN_HEIGHT // 2 - BUTTON_HEIGHT // 2 + 50, BUTTON_WIDTH, BUTTON_HEIGHT)
+        self.quit_button = pygame.Rect(SCREEN_WIDTH // 2 - BUTTON_WIDTH // 2, SCREEN_HEIGHT // 2 - BUTTON_HEIGHT // 2 + 150, BUTTON_WIDTH, BUTTON_HEIGHT)
+        # The area covered by the slider and the knob
+        self.slider_area = slider_rect.inflate(knob_width, knob_height)
+        self.layer = static_layer('main_menu', self.draw_layer)
+
+    def draw_layer(self, surface):
+        draw_text("One Line Fill Puzzle", title_font, PURPLE, surface, SCREEN_WIDTH // 2, SCREEN_HEIGHT // 4)
+        # Draw buttons
+        draw_button(surface, self.start_button, LIGHT_PINK, "Start")
+        draw_button(surface, self.rules_button, LIGHT_PINK, "Rules")
+        draw_button(surface, self.quit_button, LIGHT_PINK, "Quit")
         # Draw the volume icon
-        screen.blit(volume_icon, (slider_rect.left - 40, slider_rect.y - 10))
+        surface.blit(volume_icon, (slider_rect.left - 40, slider_rect.y - 10))
 
+    def draw(self):
+        screen.blit(self.layer, (0, 0))
         # Draw the volume slider
-        knob_rect = draw_slider(global_volume)
-        
+        self.knob_rect = draw_slider(global_volume)
         pygame.display.update()
 
-        for event in pygame.event.get():
-            if event.type == pygame.QUIT:
-                button_sound.play()
+    def handle(self, event):
+        global global_volume
+        if event.type == pygame.MOUSEBUTTONDOWN:
+            button_sound.play()
+            mouse_pos = event.pos
+            # Start the game
+            if self.start_button.collidepoint(mouse_pos):
+                return ('push', LevelSelectMenu())
+            # Show the rules
+            elif self.rules_button.collidepoint(mouse_pos):
+                return ('push', RulesMenu())
+            # Adjust the volume
+            elif self.knob_rect.collidepoint(mouse_pos):
+                self.dragging = True
+            # Quit the game
+            elif self.quit_button.collidepoint(mouse_pos):
                 pygame.mixer.music.stop()
-                pygame.quit()
-                sys.exit()
-            elif event.type == pygame.MOUSEBUTTONDOWN:
-                button_sound.play()
-                mouse_pos = event.pos
-                # Start the game
-                if start_button.collidepoint(mouse_pos):
-                    level_select_menu()
-                # Show the rules
-                elif rules_button.collidepoint(mouse_pos):
-                    rules_menu()
-                # Adjust the volume
-                elif knob_rect.collidepoint(mouse_pos):
-                    dragging = True
-                # Quit the game
-                elif quit_button.collidepoint(mouse_pos):
-                    pygame.mixer.music.stop()
-                    pygame.quit()
-                    sys.exit()
-            elif event.type == pygame.MOUSEBUTTONUP:
-                dragging = False
-            elif event.type == pygame.MOUSEMOTION:
-                if dragging:
-                    # Update the knob position
-                    new_x = max(min(event.pos[0], slider_rect.right - knob_width / 2), slider_rect.left + knob_width / 2)
-                    global_volume = adjust_volume(new_x)
-                        
-def rules_menu():
+                quit_game()
+        elif event.type == pygame.MOUSEBUTTONUP:
+            self.dragging = False
+        elif event.type == pygame.MOUSEMOTION:
+            if self.dragging:
+                # Update the knob position
+                new_x = max(min(event.pos[0], slider_rect.right - knob_width / 2), slider_rect.left + knob_width / 2)
+                global_volume = adjust_volume(new_x)
+                # Only the slider is redrawn
+                screen.blit(self.layer, self.slider_area, self.slider_area)
+                self.knob_rect = draw_slider(global_volume)
+                pygame.display.update(self.slider_area)
+        return None
+
+class RulesMenu(Scene):
     """Rules menu of the game"""
-    # Load the rules image
-    rules_image = pygame.image.load('rules.jpg')
-    image_rect = rules_image.get_rect()
-
-    while True:
-        screen.fill(WHITE)
+    def __init__(self):
+        self.back_button = pygame.Rect(10, 10, BUTTON_WIDTH, BUTTON_HEIGHT)
 
+    def draw_layer(self, surface):
         # Draw the back button
-        back_button = pygame.Rect(10, 10, BUTTON_WIDTH, BUTTON_HEIGHT)
-        pygame.draw.rect(screen, LIGHT_PINK, back_button, border_radius=20)
-        draw_text("Back", button_font, BLACK, screen, 10 + BUTTON_WIDTH // 2, 10 + BUTTON_HEIGHT // 2)
-
-        # Draw the rules image
+        draw_button(surface, self.back_button, LIGHT_PINK, "Back")
+        # Load and draw the rules image
+        rules_image = pygame.image.load('rules.jpg')
+        image_rect = rules_image.get_rect()
         image_x = (SCREEN_WIDTH - image_rect.width ) // 2
         image_y = (SCREEN_HEIGHT - image_rect.height ) // 2 + 20  # 20 pixels below the center
-        screen.blit(rules_image, (image_x, image_y))
+        surface.blit(rules_image, (image_x, image_y))
 
+    def draw(self):
+        screen.blit(static_layer('rules', self.draw_layer), (0, 0))
         pygame.display.update()
 
-        for event in pygame.event.get():
-            if event.type == pygame.QUIT:
-                pygame.quit()
-                sys.exit()
-            elif event.type == pygame.MOUSEBUTTONDOWN:
-                button_sound.play()
-                mouse_pos = event.pos
-                if back_button.collidepoint(mouse_pos):
-                    return
-
-def level_select_menu():
-    """Level select menu of the game"""
-    while True:
-        screen.fill(WHITE) # Clear the screen
-        # Title
-        draw_text("Level Select", button_font, BLACK, screen, SCREEN_WIDTH // 2, SCREEN_HEIGHT // 8)
+    def handle(self, event):
+        if event.type == pygame.MOUSEBUTTONDOWN:
+            button_sound.play()
+            if self.back_button.collidepoint(event.pos):
+                return ('pop', None)
+        return None
 
-        # Draw the level buttons
-        level_buttons = []
-        for i in range(1, 26):
-            # Calculate the position of the button
-            col = (i - 1) % 5
-            row = (i - 1) // 5
+class LevelSelectMenu(Scene):
+    '''
+    Level select menu of the game, showing the levels a page at a time.
+    Only the buttons of the page are drawn, so the menu is as fast for a large pack as for a small one.
+    
+    *** Parameters ***
+        page: int - The page to show first
+    '''
+    def __init__(self, page=0):
+        self.n_pages = max(1, (len(levels) + LEVELS_PER_PAGE - 1) // LEVELS_PER_PAGE)
+        self.page = min(page, self.n_pages - 1)
+        # Calculate the position of the buttons, the same on every page
+        self.level_buttons = []
+        for i in range(LEVELS_PER_PAGE):
+            col = i % 5
+            row = i // 5
             button_x = SCREEN_WIDTH // 2 - (BUTTON_WIDTH * 5 + BUTTON_GAP * 4) // 2 + col * (BUTTON_WIDTH + BUTTON_GAP)
             button_y = 150 + row * (BUTTON_HEIGHT + BUTTON_GAP)
-            
-            button_rect = pygame.Rect(button_x, button_y, BUTTON_WIDTH, BUTTON_HEIGHT)
-            pygame.draw.rect(screen, LIGHT_PINK, button_rect, border_radius=20)
-            draw_text(str(i), button_font, BLACK, screen, button_x + BUTTON_WIDTH // 2, button_y + BUTTON_HEIGHT // 2)
-            level_buttons.append(button_rect)
+            self.level_buttons.append(pygame.Rect(button_x, button_y, BUTTON_WIDTH, BUTTON_HEIGHT))
+        self.back_button = pygame.Rect(10, 10, BUTTON_WIDTH, BUTTON_HEIGHT)
+        self.previous_button = pygame.Rect(SCREEN_WIDTH // 2 - 100 - BUTTON_WIDTH, SCREEN_HEIGHT - BUTTON_HEIGHT - 10, BUTTON_WIDTH, BUTTON_HEIGHT)
+        self.next_button = pygame.Rect(SCREEN_WIDTH // 2 + 100, SCREEN_HEIGHT - BUTTON_HEIGHT - 10, BUTTON_WIDTH, BUTTON_HEIGHT)
 
+    def page_levels(self):
+        '''The buttons and the numbers of the levels of the current page'''
+        first = self.page * LEVELS_PER_PAGE + 1
+        return zip(self.level_buttons, range(first, min(first + LEVELS_PER_PAGE, len(levels) + 1)))
+
+    def draw_layer(self, surface):
+        # Title
+        draw_text("Level Select", button_font, BLACK, surface, SCREEN_WIDTH // 2, SCREEN_HEIGHT // 8)
+        # Draw the level buttons
+        for button_rect, i in self.page_levels():
+            draw_button(surface, button_rect, LIGHT_PINK, str(i))
             # Draw stars
             key = str(i)
             if key in levels_completed:
                 stars_count = levels_completed[key]['stars']
                 for j in range(stars_count):
-                    star_x = button_x + (j * star_width)
-                    star_y = button_y + 3 * BUTTON_HEIGHT // 4   # Stars are 3/4 down the button
-                    screen.blit(star_icon, (star_x, star_y))
-                    
+                    star_x = button_rect.x + (j * star_width)
+                    star_y = button_rect.y + 3 * BUTTON_HEIGHT // 4   # Stars are 3/4 down the button
+                    surface.blit(star_icon, (star_x, star_y))
         # Draw the back button
-        back_button = pygame.Rect(10, 10, BUTTON_WIDTH, BUTTON_HEIGHT)
-        pygame.draw.rect(screen, LIGHT_PINK, back_button, border_radius=20)
-        draw_text("Back", button_font, BLACK, screen, 10  + BUTTON_WIDTH // 2, 10 + BUTTON_HEIGHT // 2)
-
+        draw_button(surface, self.back_button, LIGHT_PINK, "Back")
+        # Draw the page buttons if there is more than one page
+        if self.n_pages > 1:
+            draw_button(surface, self.previous_button, LIGHT_PINK, "<")
+            draw_button(surface, self.next_button, LIGHT_PINK, ">")
+            draw_text(f"{self.page + 1}/{self.n_pages}", button_font, BLACK, surface, SCREEN_WIDTH // 2, self.next_button.centery)
+
+    def draw(self):
+        # The layer of a page is dropped when a record changes its stars
+        screen.blit(static_layer(f'level_select_{self.page}', self.draw_layer), (0, 0))
         pygame.display.update()
 
-        for event in pygame.event.get():
-            if event.type == pygame.QUIT:
-                pygame.quit()
-                sys.exit()
-            if event.type == pygame.MOUSEBUTTONDOWN:
-                button_sound.play()
-                mouse_pos = event.pos
-                if back_button.collidepoint(mouse_pos):
-                    main_menu()
-                for i, button_rect in enumerate(level_buttons):
-                    if button_rect.collidepoint(mouse_pos):
-                        level = i + 1
-                        play_level(level)
-
-def fill_grid(current_grid, cursor_x, cursor_y, start_x, start_y):
-    '''
-    Fills the grid based on the current cursor position and the start position.
+    def turn_page(self, step):
+        '''Show the previous (-1) or the next (1) page, if there is one'''
+        page = min(max(self.page + step, 0), self.n_pages - 1)
+        if page != self.page:
+            self.page = page
+            self.draw()
+
+    def handle(self, event):
+        # The wheel also sends buttons 4 and 5, it turns the pages instead
+        if event.type == pygame.MOUSEBUTTONDOWN and event.button < 4:
+            button_sound.play()
+            mouse_pos = event.pos
+            if self.back_button.collidepoint(mouse_pos):
+                return ('pop', None)
+            if self.n_pages > 1:
+                if self.previous_button.collidepoint(mouse_pos):
+                    self.turn_page(-1)
+                elif self.next_button.collidepoint(mouse_pos):
+                    self.turn_page(1)
+            for button_rect, i in self.page_levels():
+                if button_rect.collidepoint(mouse_pos):
+                    return ('push', PlayLevel(i))
+        elif event.type == pygame.MOUSEWHEEL:
+            self.turn_page(-event.y)
+        elif event.type == pygame.KEYDOWN:
+            if event.key in (pygame.K_LEFT, pygame.K_a, pygame.K_PAGEUP):
+                self.turn_page(-1)
+            elif event.key in (pygame.K_RIGHT, pygame.K_d, pygame.K_PAGEDOWN):
+                self.turn_page(1)
+        return None
+
+class BoardView:
+    '''
+    Drawing of a level being played.
+    The title, the buttons, the grid lines and the blocked cells are drawn once on a cached surface,
+    then only the cells changed by a move are redrawn and updated on the display.
     
     *** Parameters ***
-        current_grid: list - The current grid configuration
-        cursor_x: int - The x-coordinate of the cursor
-        cursor_y: int - The y-coordinate of the cursor
-        start_x: int - The x-coordinate of the start position
-        start_y: int - The y-coordinate of the start position
+        level: int - The level being played
+        state: PlayState - The state of the level
+        hints: HintEngine - The hints of the level
     
-    *** Returns ***
-        None
+    *** Attributes ***
+        hint: tuple - The (x, y) position of the next cell shown to the player, None for no hint
     '''
-    grid_height = len(current_grid) * 50
-    grid_width = len(current_grid[0]) * 50
-
-    # Calculate the starting position of the grid
-    start_x_px = (SCREEN_WIDTH - grid_width) // 2
-    start_y_px = (SCREEN_HEIGHT - grid_height) // 2
+    def __init__(self, level, state, hints):
+        self.state = state
+        self.hints = hints
+        self.hint = None
+        current_grid = state.current_grid
+        # Calculate the starting position of the grid
+        self.start_x_px = (SCREEN_WIDTH - len(current_grid[0]) * 50) // 2
+        self.start_y_px = (SCREEN_HEIGHT - len(current_grid) * 50) // 2
+
+        self.back_button = pygame.Rect(10, 10, BUTTON_WIDTH, BUTTON_HEIGHT)
+        self.answer_button = pygame.Rect(SCREEN_WIDTH - BUTTON_WIDTH - 10, 10, BUTTON_WIDTH, BUTTON_HEIGHT)
+        self.reset_button = pygame.Rect(SCREEN_WIDTH // 2 - BUTTON_WIDTH // 2, 10, BUTTON_WIDTH, BUTTON_HEIGHT)
+
+        self.layer = pygame.Surface(SCREEN_SIZE)
+        self.layer.fill(WHITE)
+        draw_text(f"Level {level}", button_font, BLACK, self.layer, SCREEN_WIDTH // 2, 10 + BUTTON_HEIGHT // 2)
+        draw_button(self.layer, self.back_button, GRAY, "Back")
+        draw_button(self.layer, self.answer_button, GRAY, "Answer")
+        draw_button(self.layer, self.reset_button, GRAY, "Reset")
+        # Draw the empty grid
+        for y, row in enumerate(current_grid):
+            for x, cell in enumerate(row):
+                rect = self.cell_rect(x, y)
+                pygame.draw.rect(self.layer, PURPLE if cell == BLOCKED else WHITE, rect)
+                pygame.draw.rect(self.layer, BLACK, rect, 1)
+
+    def cell_rect(self, x, y):
+        '''The rectangle of a cell on the screen'''
+        return pygame.Rect(self.start_x_px + x * 50, self.start_y_px + y * 50, 50, 50)
+
+    def draw(self):
+        '''Draw the whole screen'''
+        screen.blit(self.layer, (0, 0))
+        for x, y in self.state.path:
+            self.fill_cell(x, y)
+        draw_path(screen, self.state.path, self.state.current_grid)
+        self.draw_hint()
+        self.draw_cursor()
+        pygame.display.update()
 
-    # Draw the grid
-    for y, row in enumerate(current_grid):
-        for x, cell in enumerate(row):
-            rect = pygame.Rect(start_x_px + x * 50, start_y_px + y * 50, 50, 50)
-            color = WHITE if cell == 0 else LIGHT_PINK if cell == 1 else PURPLE
-            pygame.draw.rect(screen, color, rect)
+    def draw_cells(self, cells):
+        '''
+        Redraw some cells at the end of the line and update them on the display
+        
+        *** Parameters ***
+            cells: set - The (x, y) positions of the cells, that are or were in the last cells of the line
+                or shown as the hint
+        
+        *** Returns ***
+            None
+        '''
+        rects = []
+        for x, y in cells:
+            rect = self.cell_rect(x, y)
+            screen.blit(self.layer, rect, rect)
+            if self.state.current_grid[y][x] == FILLED:
+                self.fill_cell(x, y)
+            rects.append(rect)
+        # Redraw the segments of the line that cross the cells
+        path = self.state.path
+        tail = path[max(0, len(path) - 4):]
+        for p1, p2 in zip(tail, tail[1:]):
+            if p1 in cells or p2 in cells:
+                draw_path(screen, [p1, p2], self.state.current_grid)
+        if self.hint in cells:
+            self.draw_hint()
+        self.draw_cursor()
+        pygame.display.update(rects)
+
+    def fill_cell(self, x, y):
+        '''Draw a filled cell, the start position is drawn without its border'''
+        rect = self.cell_rect(x, y)
+        pygame.draw.rect(screen, LIGHT_PINK, rect)
+        if (x, y) != (self.state.start_x, self.state.start_y):
             pygame.draw.rect(screen, BLACK, rect, 1)
-            
-    # Draw the start position
-    pygame.draw.rect(screen, LIGHT_PINK, (start_x_px + start_x * 50, start_y_px + start_y * 50, 50, 50))
-    # Draw the cursor
-    pygame.draw.rect(screen, PINK, (start_x_px + cursor_x * 50, start_y_px + cursor_y * 50, 50, 50), 3)
 
-def draw_path(screen, pre_x, pre_y, current_grid):
+    def draw_cursor(self):
+        '''Draw the cursor, in red when the line can no longer be completed'''
+        color = RED if self.hints.dead else PINK
+        pygame.draw.rect(screen, color, self.cell_rect(self.state.cursor_x, self.state.cursor_y), 3)
+
+    def draw_hint(self):
+        '''Draw the hint, a dot in the next cell of a solution'''
+        if self.hint is not None:
+            pygame.draw.circle(screen, PINK, self.cell_rect(*self.hint).center, 8)
+
+def draw_path(screen, path, current_grid):
     '''
-    Draws the path based on previous positions and the current grid configuration.
+    Draws the path based on the positions of the line and the current grid configuration.
     
     *** Parameters ***
         screen: pygame.Surface - The screen to draw the path on
-        pre_x: list - The previous x-coordinates
-        pre_y: list - The previous y-coordinates
+        path: list - The (x, y) positions of the line
         current_grid: list - The current grid configuration
     
     *** Returns ***
         None
     '''
+    if len(path) < 2:
+        return
     grid_height = len(current_grid) * 50
     grid_width = len(current_grid[0]) * 50
 
     start_x_px = (SCREEN_WIDTH - grid_width) // 2
     start_y_px = (SCREEN_HEIGHT - grid_height) // 2
 
-    for i in range(len(pre_x) - 1):
-        pygame.draw.line(screen, PINK,
-                         (start_x_px + pre_x[i] * 50 + 25, start_y_px + pre_y[i] * 50 + 25),
-                         (start_x_px + pre_x[i+1] * 50 + 25, start_y_px + pre_y[i+1] * 50 + 25), 3)
+    points = [(start_x_px + x * 50 + 25, start_y_px + y * 50 + 25) for x, y in path]
+    pygame.draw.lines(screen, PINK, False, points, 3)
 
-def play_level(level):
+class PlayLevel(Scene):
     '''
     Play the selected level
     
     *** Parameters ***
         level: int - The level to play
+    '''
+    def __init__(self, level):
+        self.level = level
+        grid = levels[level - 1]["grid"]
+        self.state = PlayState(grid, levels[level - 1]["start"])
+        # Checks the line after every move, and shows the next move of a solution when hints are on
+        self.hints = HintEngine(grid, levels[level - 1]["start"])
+        self.show_hint = False
+        self.view = BoardView(level, self.state, self.hints)
+        self.start_time = pygame.time.get_ticks()  # Get the start time
+
+        # Solve this level and the next one in the background, before the player asks for the answer
+        for n in (level, level + 1):
+            if n <= len(levels):
+                next_level = levels[n - 1]
+                prefetcher.prefetch(n, next_level["grid"], next_level["start"], rate="difficulty" not in next_level)
+
+    def draw(self):
+        self.view.draw()
+
+    def handle(self, event):
+        state, view = self.state, self.view
+        if event.type == pygame.MOUSEBUTTONDOWN:
+            button_sound.play()
+            mouse_pos = event.pos
+            
+            # Return to the level select menu
+            if view.back_button.collidepoint(mouse_pos):
+                return ('pop', None)
+
+            # Show the answer
+            elif view.answer_button.collidepoint(mouse_pos):
+                return ('push', AnswerScreen(self.level))
+
+            # Reset the grid
+            elif view.reset_button.collidepoint(mouse_pos):
+                state.reset()
+                self.hints.sync(state.path)
+                view.hint = self.hints.next_move() if self.show_hint else None
+                view.draw()
+                
+        elif event.type == pygame.KEYDOWN:
+            button_sound.play()
+            # The cells at the end of the line before the key
+            tail = state.path[-2:]
+            # Move the cursor
+            ## UP
+            if event.key == pygame.K_UP or event.key == pygame.K_w:
+                state.move(0, -1)
+            ## DOWN
+            elif event.key == pygame.K_DOWN or event.key == pygame.K_s:
+                state.move(0, 1)
+            ## LEFT
+            elif event.key == pygame.K_LEFT or event.key == pygame.K_a:
+                state.move(-1, 0)
+            ## RIGHT
+            elif event.key == pygame.K_RIGHT or event.key == pygame.K_d:
+                state.move(1, 0)
+            # UNDO
+            elif event.key == pygame.K_z:
+                state.undo()
+            # RESET
+            elif event.key == pygame.K_r:
+                state.reset()
+                self.hints.sync(state.path)
+                view.hint = self.hints.next_move() if self.show_hint else None
+                view.draw()
+                return None
+            # HINT
+            elif event.key == pygame.K_h:
+                self.show_hint = not self.show_hint
+            self.hints.sync(state.path)
+            hint = view.hint
+            view.hint = self.hints.next_move() if self.show_hint else None
+            # Redraw the cells at the end of the line and the hint, before and after the key
+            if state.path[-2:] != tail or view.hint != hint:
+                view.draw_cells(set(tail) | set(state.path[-2:]) | {hint, view.hint} - {None})
+        return None
+
+    def update(self):
+        # Check if the level is completed
+        if not self.state.is_complete():
+            return None
+        end_time = pygame.time.get_ticks()  # Get the end time
+        completion_time = (end_time - self.start_time) / 1000
+
+        # Get the stars based on the completion time, the time limits grow with the difficulty of the level
+        prefetcher.poll()
+        difficulty = levels[self.level - 1].get("difficulty") or prefetcher.difficulties.get(self.level)
+        three_stars_time, two_stars_time = star_times(difficulty)
+        if completion_time <= three_stars_time:
+            stars = 3
+        elif completion_time <= two_stars_time:
+            stars = 2
+        else:
+            stars = 1
     
-    *** Returns ***
-        None
+        # Update the levels completed data
+        level = self.level
+        if str(level) not in levels_completed or \
+        completion_time < levels_completed[str(level)]['time']:
+            save_game_data(level, {'time': completion_time, 'stars': stars})
+            # The stars on the level select menu changed
+            static_layers.pop(f'level_select_{(level - 1) // LEVELS_PER_PAGE}', None)
+        return ('replace', WinScreen(level, completion_time, stars))
+
+class WinScreen(Scene):
     '''
-    running = True
-
-    grid = levels[level - 1]["grid"]
-    start_x, start_y = levels[level - 1]["start"]
-    cursor_x, cursor_y = start_x, start_y
-    pre_x = [cursor_x]
-    pre_y = [cursor_y]
-    # Initialize the grid
-    current_grid = [[0 for _ in range(len(grid[0]))] for _ in range(len(grid))]
-    # Fill the grid based on the level configuration
-    grid_fill_count = 0
-    for y, row in enumerate(grid):
-        for x, cell in enumerate(row):
-            if cell == 'x':
-                grid_fill_count += 1
-                current_grid[y][x] = -1
-    # Set the start position
-    current_grid[start_y][start_x] = 1
-    
-    grid_fill_count = len(current_grid) * len(current_grid[0]) - grid_fill_count
-    current_fill_count = 1
-
-    start_time = pygame.time.get_ticks()  # Get the start time
-    while running:
-        # Draw the screen
+    Completion screen of a level
+    
+    *** Parameters ***
+        level: int - The completed level
+        completion_time: float - The completion time in s
+        stars: int - The number of stars
+    '''
+    def __init__(self, level, completion_time, stars):
+        global current_music
+        self.level = level
+        self.completion_time = completion_time
+        self.stars = stars
+        self.back_to_level_select_button = pygame.Rect(SCREEN_WIDTH // 2 - BUTTON_WIDTH // 2, SCREEN_HEIGHT // 2 - BUTTON_HEIGHT, BUTTON_WIDTH, BUTTON_HEIGHT)
+        self.replay_button = pygame.Rect(SCREEN_WIDTH // 2 - BUTTON_WIDTH // 2, SCREEN_HEIGHT // 2 - BUTTON_HEIGHT // 2 + 40, BUTTON_WIDTH, BUTTON_HEIGHT)
+        self.next_level_button = pygame.Rect(SCREEN_WIDTH // 2 - BUTTON_WIDTH // 2, SCREEN_HEIGHT // 2 + 80, BUTTON_WIDTH + 10, BUTTON_HEIGHT)
+
+        # Show the completion screen
+        pygame.time.wait(700)
         screen.fill(WHITE)
+        pygame.display.update()
+        pygame.mixer.music.stop()
+        # Load the congrats music
+        pygame.mixer.music.load(congrats_music)
+        pygame.mixer.music.play(0)  # 0 means play once
+        pygame.time.wait(200)
+        current_music = 'congrats'
+
+    def draw(self):
+        # The completion screen does not change until a button is pressed
+        screen.fill(WHITE)
+        draw_text(f"Level {self.level}", button_font, BLACK, screen, SCREEN_WIDTH // 2, 10 + BUTTON_HEIGHT // 2)
+        draw_text("You Win!", button_font, BLACK, screen, SCREEN_WIDTH // 2, SCREEN_HEIGHT // 4)
 
-        draw_text(f"Level {level}", button_font, BLACK, screen, SCREEN_WIDTH // 2, 10 + BUTTON_HEIGHT // 2)
+        draw_text(f"Completion Time: {self.completion_time:.2f} s", button_font, BLACK, screen, SCREEN_WIDTH // 2, SCREEN_HEIGHT // 4 + 40)
+        if self.stars == 3:
+            screen.blit(star_icon, (SCREEN_WIDTH // 2 - 50, SCREEN_HEIGHT // 4 + 60))
+            screen.blit(star_icon, (SCREEN_WIDTH // 2 - 15, SCREEN_HEIGHT // 4 + 60))
+            screen.blit(star_icon, (SCREEN_WIDTH // 2 + 20, SCREEN_HEIGHT // 4 + 60))
+        elif self.stars == 2:
+            screen.blit(star_icon, (SCREEN_WIDTH // 2 - 25, SCREEN_HEIGHT // 4 + 60))
+            screen.blit(star_icon, (SCREEN_WIDTH // 2 + 10, SCREEN_HEIGHT // 4 + 60))
+        elif self.stars == 1:
+            screen.blit(star_icon, (SCREEN_WIDTH // 2 - 15, SCREEN_HEIGHT // 4 + 60))
 
-        # Draw the back button
-        back_button = pygame.Rect(10, 10, BUTTON_WIDTH, BUTTON_HEIGHT)
-        pygame.draw.rect(screen, GRAY, back_button, border_radius=20)
-        draw_text("Back", button_font, BLACK, screen, 10 + BUTTON_WIDTH // 2, 10 + BUTTON_HEIGHT // 2)
-
-        # Draw the answer button
-        answer_button = pygame.Rect(SCREEN_WIDTH - BUTTON_WIDTH - 10, 10, BUTTON_WIDTH, BUTTON_HEIGHT)
-        pygame.draw.rect(screen, GRAY, answer_button, border_radius=20)
-        draw_text("Answer", button_font, BLACK, screen, SCREEN_WIDTH - BUTTON_WIDTH // 2 - 10, 10+BUTTON_HEIGHT // 2)
-
-        # Draw the reset button
-        reset_button = pygame.Rect(SCREEN_WIDTH // 2 - BUTTON_WIDTH // 2, 10, BUTTON_WIDTH, BUTTON_HEIGHT)
-        pygame.draw.rect(screen, GRAY, reset_button, border_radius=20)
-        draw_text("Reset", button_font, BLACK, screen, SCREEN_WIDTH // 2, 10 + BUTTON_HEIGHT // 2)
-
-        # Fill the grid
-        fill_grid(current_grid, cursor_x, cursor_y, start_x, start_y)
-        
-        # Draw the path
-        x_path = pre_x.copy()
-        x_path.append(cursor_x)
-        y_path = pre_y.copy()
-        y_path.append(cursor_y)
+        pygame.draw.rect(screen, LIGHT_PINK, self.back_to_level_select_button, border_radius=20)
+        draw_text("Back", button_font, BLACK, screen, SCREEN_WIDTH // 2, SCREEN_HEIGHT // 2 - BUTTON_HEIGHT // 2)
+
+        pygame.draw.rect(screen, LIGHT_PINK, self.replay_button, border_radius=20)
+        draw_text("Replay", button_font, BLACK, screen, SCREEN_WIDTH // 2, SCREEN_HEIGHT // 2 + 40)
 
-        draw_path(screen, x_path, y_path, current_grid)
+        pygame.draw.rect(screen, LIGHT_PINK, self.next_level_button, border_radius=20)
+        draw_text("Next", button_font, BLACK, screen, SCREEN_WIDTH // 2, SCREEN_HEIGHT // 2 + BUTTON_HEIGHT // 2 + 80)
 
-        # Update the screen
         pygame.display.update()
 
-        # Check if the level is completed
-        # Check if the current grid is filled
-        current_fill_count = 0
-        for y, row in enumerate(current_grid):
-            for x, cell in enumerate(row):
-                if cell == 1:
-                    current_fill_count += 1
-                    
-        if current_fill_count == grid_fill_count:
-            end_time = pygame.time.get_ticks()  # Get the end time
-            completion_time = (end_time - start_time) / 1000
-
-            # Get the stars based on the completion time
-            if completion_time <= 30:
-                stars = 3
-            elif completion_time <= 60:
-                stars = 2
-            else:
-                stars = 1
-        
-            # Update the levels completed data
-            if str(level) not in levels_completed or \
-            completion_time < levels_completed[str(level)]['time']:
-                levels_completed[str(level)] = {'time': completion_time, 'stars': stars}
-                save_game_data(levels_completed)
-                
-            # Show the completion screen
-            pygame.time.wait(700)
-            screen.fill(WHITE)
-            pygame.display.update()
-            pygame.mixer.music.stop()
-            # Load the congrats music
-            pygame.mixer.music.load(congrats_music)
-            pygame.mixer.music.play(0)  # 0 means play once
-            pygame.time.wait(200)
-            current_music = 'congrats'
-            # Show the completion screen
-            while True:
-                screen.fill(WHITE)
-                draw_text(f"Level {level}", button_font, BLACK, screen, SCREEN_WIDTH // 2, 10 + BUTTON_HEIGHT // 2)
-                draw_text("You Win!", button_font, BLACK, screen, SCREEN_WIDTH // 2, SCREEN_HEIGHT // 4)
-
-                draw_text(f"Completion Time: {completion_time:.2f} s", button_font, BLACK, screen, SCREEN_WIDTH // 2, SCREEN_HEIGHT // 4 + 40)
-                if stars == 3:
-                    screen.blit(star_icon, (SCREEN_WIDTH // 2 - 50, SCREEN_HEIGHT // 4 + 60))
-                    screen.blit(star_icon, (SCREEN_WIDTH // 2 - 15, SCREEN_HEIGHT // 4 + 60))
-                    screen.blit(star_icon, (SCREEN_WIDTH // 2 + 20, SCREEN_HEIGHT // 4 + 60))
-                elif stars == 2:
-                    screen.blit(star_icon, (SCREEN_WIDTH // 2 - 25, SCREEN_HEIGHT // 4 + 60))
-                    screen.blit(star_icon, (SCREEN_WIDTH // 2 + 10, SCREEN_HEIGHT // 4 + 60))
-                elif stars == 1:
-                    screen.blit(star_icon, (SCREEN_WIDTH // 2 - 15, SCREEN_HEIGHT // 4 + 60))
-                
-                back_to_level_select_button = pygame.Rect(SCREEN_WIDTH // 2 - BUTTON_WIDTH // 2, SCREEN_HEIGHT // 2 - BUTTON_HEIGHT, BUTTON_WIDTH, BUTTON_HEIGHT)
-                replay_button = pygame.Rect(SCREEN_WIDTH // 2 - BUTTON_WIDTH // 2, SCREEN_HEIGHT // 2 - BUTTON_HEIGHT // 2 + 40, BUTTON_WIDTH, BUTTON_HEIGHT)
-                next_level_button = pygame.Rect(SCREEN_WIDTH // 2 - BUTTON_WIDTH // 2, SCREEN_HEIGHT // 2 + 80, BUTTON_WIDTH + 10, BUTTON_HEIGHT)
-
-                pygame.draw.rect(screen, LIGHT_PINK, back_to_level_select_button, border_radius=20)
-                draw_text("Back", button_font, BLACK, screen, SCREEN_WIDTH // 2, SCREEN_HEIGHT // 2 - BUTTON_HEIGHT // 2)
-
-                pygame.draw.rect(screen, LIGHT_PINK, replay_button, border_radius=20)
-                draw_text("Replay", button_font, BLACK, screen, SCREEN_WIDTH // 2, SCREEN_HEIGHT // 2 + 40)
-
-                pygame.draw.rect(screen, LIGHT_PINK, next_level_button, border_radius=20)
-                draw_text("Next", button_font, BLACK, screen, SCREEN_WIDTH // 2, SCREEN_HEIGHT // 2 + BUTTON_HEIGHT // 2 + 80)
-
-                pygame.display.update()
-                for event in pygame.event.get():
-                    if event.type == pygame.QUIT:
-                        pygame.quit()
-                        sys.exit()
-                    if event.type == pygame.MOUSEBUTTONDOWN:
-                        button_sound.play()
-                        mouse_pos = event.pos
-                        if back_to_level_select_button.collidepoint(mouse_pos):
-                            level_select_menu()
-                        if replay_button.collidepoint(mouse_pos):
-                            play_level(level)
-
-                        elif next_level_button.collidepoint(mouse_pos):
-                            # If it's the last level, return to level select menu
-                            if level == len(levels):
-                                level_select_menu()
-                            else:
-                                play_level(level + 1)
-                    if event.type == MUSIC_END:
-                        if current_music == 'congrats':
-                            # If the congrats music ends, play the background music
-                            pygame.time.wait(500)
-                            pygame.mixer.music.load(bg_music)
-                            pygame.mixer.music.play(-1)
-                            current_music = 'bg'
-                            
-        for event in pygame.event.get():
-            if event.type == pygame.QUIT:
-                pygame.quit()
-                sys.exit()
-            if event.type == pygame.MOUSEBUTTONDOWN:
-                button_sound.play()
-                mouse_pos = event.pos
-                
-                # Return to the level select menu
-                if back_button.collidepoint(mouse_pos):
-                    level_select_menu()
-
-                # Show the answer
-                elif answer_button.collidepoint(mouse_pos):
-                    show_answer(level)
-
-                # Reset the grid
-                elif reset_button.collidepoint(mouse_pos):
-                    for y, row in enumerate(current_grid):
-                        for x, cell in enumerate(row):
-                            if not(x == start_x and y == start_y) and cell == 1:
-                                current_grid[y][x] = 0
-                    cursor_x, cursor_y = start_x, start_y
-                    pre_x = [cursor_x]
-                    pre_y = [cursor_y]
-                    
-            elif event.type == pygame.KEYDOWN:
-                button_sound.play()
-                # Move the cursor
-                ## UP
-                if event.key == pygame.K_UP or event.key == pygame.K_w:
-                    # If out of bounds, do nothing
-                    if cursor_y == 0:
-                        continue
-                    # If the cell cannot be filled, do nothing
-                    if current_grid[cursor_y-1][cursor_x] == -1:
-                        continue
-                    # If the cell is filled and not the previous cell, do nothing
-                    if current_grid[cursor_y-1][cursor_x] == 1 and (cursor_x, cursor_y-1) != (pre_x[-1], pre_y[-1]):
-                        continue
-                    # If the cell is the previous cell, remove the previous cell
-                    if (cursor_x, cursor_y-1) == (pre_x[-1], pre_y[-1]):
-                        pre_x.pop()
-                        pre_y.pop()
-                        # Remove the current cell
-                        current_grid[cursor_y][cursor_x] = 0
-                        cursor_y = max(0, cursor_y - 1)
-                    else:
-                        # Add the current cell to the path
-                        pre_x.append(cursor_x)
-                        pre_y.append(cursor_y)
-                        cursor_y = max(0, cursor_y - 1)
-                        current_grid[cursor_y][cursor_x] = 1
-                ## DOWN
-                elif event.key == pygame.K_DOWN or event.key == pygame.K_s:
-                    if cursor_y == len(current_grid) - 1:
-                        continue
-                    if current_grid[cursor_y + 1][cursor_x] == -1:
-                        continue
-                    if current_grid[cursor_y + 1][cursor_x] == 1 and (cursor_x, cursor_y + 1) != (pre_x[-1], pre_y[-1]):
-                        continue
-                    if (cursor_x, cursor_y + 1) == (pre_x[-1], pre_y[-1]):
-                        pre_x.pop()
-                        pre_y.pop()
-                        current_grid[cursor_y][cursor_x] = 0
-                        cursor_y = min(len(current_grid) - 1, cursor_y + 1)
-                    else:
-                        pre_x.append(cursor_x)
-                        pre_y.append(cursor_y)
-                        cursor_y = min(len(current_grid) - 1, cursor_y + 1)
-                        current_grid[cursor_y][cursor_x] = 1
-                    
-                ## LEFT
-                elif event.key == pygame.K_LEFT or event.key == pygame.K_a:
-                    if cursor_x == 0:
-                        continue
-                    if current_grid[cursor_y][cursor_x - 1] == -1:
-                        continue
-                    if current_grid[cursor_y][cursor_x - 1] == 1 and (cursor_x - 1, cursor_y) != (pre_x[-1], pre_y[-1]):
-                        continue
-                    if (cursor_x - 1, cursor_y) == (pre_x[-1], pre_y[-1]):
-                        pre_x.pop()
-                        pre_y.pop()
-                        current_grid[cursor_y][cursor_x] = 0
-                        cursor_x = max(0, cursor_x - 1)
-                    else:
-                        pre_x.append(cursor_x)
-                        pre_y.append(cursor_y)
-                        cursor_x = max(0, cursor_x - 1)
-                        current_grid[cursor_y][cursor_x] = 1
-                        
-                ## RIGHT
-                elif event.key == pygame.K_RIGHT or event.key == pygame.K_d:
-                    if cursor_x == len(current_grid[0]) - 1:
-                        continue
-                    if current_grid[cursor_y][cursor_x + 1] == -1:
-                        continue
-                    if current_grid[cursor_y][cursor_x + 1] == 1 and (cursor_x + 1, cursor_y) != (pre_x[-1], pre_y[-1]):
-                        continue
-                    if (cursor_x + 1, cursor_y) == (pre_x[-1], pre_y[-1]):
-                        pre_x.pop()
-                        pre_y.pop()
-                        current_grid[cursor_y][cursor_x] = 0
-                        cursor_x = min(len(current_grid[0]) - 1, cursor_x + 1)
-                    else:
-                        pre_x.append(cursor_x)
-                        pre_y.append(cursor_y)
-                        cursor_x = min(len(current_grid[0]) - 1, cursor_x + 1)
-                        current_grid[cursor_y][cursor_x] = 1
-                        
-                # UNDO
-                elif event.key == pygame.K_z:
-                    if len(pre_x) > 1:
-                        current_grid[cursor_y][cursor_x] = 0
-                        cursor_x = pre_x.pop()
-                        cursor_y = pre_y.pop()
-                # RESET
-                elif event.key == pygame.K_r:
-                    for y, row in enumerate(current_grid):
-                        for x, cell in enumerate(row):
-                            if not(x == start_x and y == start_y) and cell == 1:
-                                current_grid[y][x] = 0
-                    cursor_x, cursor_y = start_x, start_y
-                    pre_x = [cursor_x]
-                    pre_y = [cursor_y]
-
-def fill(grid, x, y, counter, total_o, solutions):
-    '''
-    Fill the grid recursively
+    def handle(self, event):
+        if event.type == pygame.MOUSEBUTTONDOWN:
+            button_sound.play()
+            mouse_pos = event.pos
+            if self.back_to_level_select_button.collidepoint(mouse_pos):
+                return ('pop', None)
+            if self.replay_button.collidepoint(mouse_pos):
+                return ('replace', PlayLevel(self.level))
+            elif self.next_level_button.collidepoint(mouse_pos):
+                # If it's the last level, return to level select menu
+                if self.level == len(levels):
+                    return ('pop', None)
+                return ('replace', PlayLevel(self.level + 1))
+        return None
+
+def answer_polyline(grid, start, moves):
+    '''
+    Compute the pixel positions of the line of a solution, from the start to the end
     
     *** Parameters ***
-        grid: list - The grid to fill
-        x: int - The x-coordinate
-        y: int - The y-coordinate
-        counter: int - The counter
-        total_o: int - The total number of 'o's
-        solutions: list - The solutions
+        grid: list - The level grid of 'o' and 'x' strings
+        start: list - The start position [x, y] of the level
+        moves: str - The moves of the solution
     
     *** Returns ***
-        bool - True if a solution is found, False otherwise
+        points: list - The centers of the visited cells on the screen
     '''
-    if not (0 <= x < len(grid) and 0 <= y < len(grid[0])):  # if out of bounds
-        return
-    if grid[x][y] != 'o':  # if not an 'o'
-        return
-
-    # Mark
-    grid[x][y] = counter
-
-    # If all 'o's are filled
-    if counter == total_o:
-        # Add the solution
-        solutions.append(copy.deepcopy(grid))
-        if len(solutions) == 3:  # Stop after finding 3 solutions
-            return True
-        grid[x][y] = 'o'
-        return False
-
-    # Try filling in all directions
-    for dx, dy in [(0, 1), (1, 0), (0, -1), (-1, 0)]:  # right, down, left, up
-        if fill(grid, x + dx, y + dy, counter + 1, total_o, solutions):
-            return True
-
-    # If no solution is found, backtrack
-    grid[x][y] = 'o'
-    return False
+    # Calculate the starting position of the grid
+    start_x_px = (SCREEN_WIDTH - len(grid[0]) * 50) // 2
+    start_y_px = (SCREEN_HEIGHT - len(grid) * 50) // 2
+    return [(start_x_px + x * 50 + 25, start_y_px + y * 50 + 25) for x, y in moves_to_path(start, moves)]
 
-def draw_answer(solution):
+def draw_answer_grid(surface, grid):
     '''
-    Draw the answer on the screen
+    Draw the cells of the level behind the answer
     
     *** Parameters ***
-        solution: list - The solution to draw
+        surface: pygame.Surface - The surface to draw the grid on
+        grid: list - The level grid of 'o' and 'x' strings
     
     *** Returns ***
         None
     '''
-    # Calculate the height and width of the grid
-    grid_height = len(solution) * 50
-    grid_width = len(solution[0]) * 50
-
     # Calculate the starting position of the grid
-    start_x_px = (SCREEN_WIDTH - grid_width) // 2
-    start_y_px = (SCREEN_HEIGHT - grid_height) // 2
+    start_x_px = (SCREEN_WIDTH - len(grid[0]) * 50) // 2
+    start_y_px = (SCREEN_HEIGHT - len(grid) * 50) // 2
 
     # Draw the grid
-    for y, row in enumerate(solution):
+    for y, row in enumerate(grid):
         for x, cell in enumerate(row):
             rect = pygame.Rect(start_x_px + x * 50, start_y_px + y * 50, 50, 50)
             color = LIGHT_PINK if cell != 'x' else PURPLE
-            pygame.draw.rect(screen, color, rect)
-            pygame.draw.rect(screen, BLACK, rect, 1)
-
-    # Convert the solution to a numpy array
-    solution = np.array(solution)
-    n_fill = solution.shape[0] * solution.shape[1] - np.sum(solution == 'x')
-    for i in range(n_fill - 1):
-        y, x = np.where(solution == str(i + 1))
-        y_next, x_next = np.where(solution == str(i + 2))
+            pygame.draw.rect(surface, color, rect)
+            pygame.draw.rect(surface, BLACK, rect, 1)
 
-        # Calculate the points
-        points = list(zip(start_x_px + x * 50 + 25, start_y_px + y * 50 + 25))
-        next_points = list(zip(start_x_px + x_next * 50 + 25, start_y_px + y_next * 50 + 25))
-
-        # Draw the lines
-        for p1, p2 in zip(points, next_points):
-            pygame.draw.line(screen, PINK, p1, p2, 3)
-
-        # Draw the circles
-        if i == 0:
-            pygame.draw.circle(screen, PINK, points[0], 10)
-
-def show_answer(level):
+def draw_answer(surface, points):
     '''
-    Show the answer to the selected level
+    Draw the line of an answer
     
     *** Parameters ***
-        level: int - The level to show the answer
+        surface: pygame.Surface - The surface to draw the answer on
+        points: list - The pixel positions of the line, from answer_polyline
     
     *** Returns ***
         None
     '''
-    # Load the level data
-    grid = levels[level - 1]["grid"]
-    start_y, start_x = levels[level - 1]["start"]
+    if len(points) > 1:
+        pygame.draw.lines(surface, PINK, False, points, 3)
+    # Draw the circle at the start
+    pygame.draw.circle(surface, PINK, points[0], 10)
 
-    # Calculate the total number of 'o's
-    total_o = sum(row.count('o') for row in grid)
-
-    # Find the solutions
-    solutions = []
-    fill(grid, start_x, start_y, 1, total_o, solutions)
-
-    current_solution_index = 0
-
-    running = True
-    while running:
-        screen.fill(WHITE)
-        draw_text(f"Answer {current_solution_index + 1}", button_font, BLACK, screen, SCREEN_WIDTH // 2, 10 + BUTTON_HEIGHT // 2)
-
-        # Draw the back button
-        close_button = pygame.Rect(10, 10, BUTTON_WIDTH, BUTTON_HEIGHT)
-        pygame.draw.rect(screen, GRAY, close_button, border_radius=20)
-        draw_text("Close", button_font, BLACK, screen, 10 + BUTTON_WIDTH // 2, 10 + BUTTON_HEIGHT // 2)
+class AnswerScreen(Scene):
+    '''
+    Show the answer to the selected level.
+    The solutions are searched by a worker process and shown as they arrive, the screen keeps
+    responding while it is solving and Close stops the search.
+    
+    *** Parameters ***
+        level: int - The level to show the answer
+    '''
+    def __init__(self, level):
+        # Load the level data
+        self.grid = levels[level - 1]["grid"]
+        self.start = levels[level - 1]["start"]
+
+        # Start searching the solutions in the background
+        self.solutions = SolverProcess(self.grid, self.start, SOLUTION_CACHE)
+        self.solving_seconds = 0  # The solving time shown in the title
+
+        self.current_solution_index = 0
+        # The line of each solution is computed once, when it is first shown
+        self.polylines = {}
+        self.background = None
+        self.close_button = pygame.Rect(10, 10, BUTTON_WIDTH, BUTTON_HEIGHT)
+        self.left_button = pygame.Rect(SCREEN_WIDTH // 2 - 100 - BUTTON_WIDTH, SCREEN_HEIGHT // 8 * 7, BUTTON_WIDTH, BUTTON_HEIGHT)
+        self.right_button = pygame.Rect(SCREEN_WIDTH // 2 + 100, SCREEN_HEIGHT // 8 * 7, BUTTON_WIDTH, BUTTON_HEIGHT)
+
+    @property
+    def animating(self):
+        # Frames are needed to collect the solutions while the worker is searching
+        return self.solutions.busy
+
+    def draw_layer(self, surface):
+        # Draw the close, left and right buttons
+        draw_button(surface, self.close_button, GRAY, "Close")
+        draw_button(surface, self.left_button, GRAY, "<")
+        draw_button(surface, self.right_button, GRAY, ">")
+
+    def draw(self):
+        # The buttons and the cells of the level are the same for every solution
+        if self.background is None:
+            self.background = static_layer('answer', self.draw_layer).copy()
+            draw_answer_grid(self.background, self.grid)
+        screen.blit(self.background, (0, 0))
+        moves = self.solutions.get(self.current_solution_index)
+        if moves is not None:
+            title = f"Answer {self.current_solution_index + 1}"
+        elif self.solutions.busy:
+            title = f"Solving... {self.solving_seconds} s"
+        else:
+            title = "No Answer"
+        draw_text(title, button_font, BLACK, screen, SCREEN_WIDTH // 2, 10 + BUTTON_HEIGHT // 2)
 
         # Draw the answer
-        draw_answer(solutions[current_solution_index])  # Draw the answer according to the current solution index
+        if moves is not None:
+            if self.current_solution_index not in self.polylines:
+                self.polylines[self.current_solution_index] = answer_polyline(self.grid, self.start, moves)
+            draw_answer(screen, self.polylines[self.current_solution_index])  # Draw the answer according to the current solution index
+        pygame.display.update()
 
-        # Draw the left and right buttons
-        left_button = pygame.Rect(SCREEN_WIDTH // 2 - 100 - BUTTON_WIDTH, SCREEN_HEIGHT // 8 * 7, BUTTON_WIDTH, BUTTON_HEIGHT)
-        right_button = pygame.Rect(SCREEN_WIDTH // 2 + 100, SCREEN_HEIGHT // 8 * 7, BUTTON_WIDTH, BUTTON_HEIGHT)
-        pygame.draw.rect(screen, GRAY, left_button, border_radius=20)
-        pygame.draw.rect(screen, GRAY, right_button, border_radius=20)
-        draw_text("<", button_font, BLACK, screen, left_button.centerx, left_button.centery)
-        draw_text(">", button_font, BLACK, screen, right_button.centerx, right_button.centery)
+    def handle(self, event):
+        index = self.current_solution_index
+        if event.type == pygame.MOUSEBUTTONDOWN:
+            button_sound.play()
+            mouse_pos = event.pos
+            if self.close_button.collidepoint(mouse_pos):
+                self.solutions.cancel()
+                return ('pop', None)
+            elif self.left_button.collidepoint(mouse_pos):
+                index = self.solutions.previous_index(index)  # Switch to the previous solution
+            elif self.right_button.collidepoint(mouse_pos):
+                index = self.solutions.next_index(index)  # Switch to the next solution
+        elif event.type == pygame.KEYDOWN:
+            if event.key == pygame.K_a or event.key == pygame.K_LEFT:
+                index = self.solutions.previous_index(index)  # Switch to the previous solution
+            elif event.key == pygame.K_d or event.key == pygame.K_RIGHT:
+                index = self.solutions.next_index(index)  # Switch to the next solution
+        # Only redraw when another solution is selected
+        if index != self.current_solution_index:
+            self.current_solution_index = index
+            self.draw()
+        return None
+
+    def update(self):
+        waiting = self.solutions.get(self.current_solution_index) is None
+        if self.solutions.poll():
+            if self.solutions.exhausted and self.current_solution_index >= len(self.solutions.found):
+                # There is no solution after the last one, go back to the first
+                self.current_solution_index = 0
+            if waiting:
+                self.draw()
+        elif waiting and self.solutions.busy and int(self.solutions.elapsed) != self.solving_seconds:
+            # Show how long the search has been running
+            self.solving_seconds = int(self.solutions.elapsed)
+            self.draw()
+        return None
 
-        pygame.display.update()
-        for event in pygame.event.get():
-            if event.type == pygame.QUIT:
-                pygame.quit()
-                sys.exit()
-            if event.type == pygame.MOUSEBUTTONDOWN:
-                button_sound.play()
-                mouse_pos = event.pos
-                if close_button.collidepoint(mouse_pos):
-                    current_solution_index = 0
-                    #running = False
-                    return
-                elif left_button.collidepoint(mouse_pos):
-                    current_solution_index = (current_solution_index - 1) % len(solutions)  # Switch to the previous solution
-                elif right_button.collidepoint(mouse_pos):
-                    current_solution_index = (current_solution_index + 1) % len(solutions)  # Switch to the next solution
-            elif event.type == pygame.KEYDOWN:
-                if event.key == pygame.K_a or event.key == pygame.K_LEFT:
-                    current_solution_index = (current_solution_index - 1) % len(solutions)  # Switch to the previous solution
-                elif event.key == pygame.K_d or event.key == pygame.K_RIGHT:
-                    current_solution_index = (current_solution_index + 1) % len(solutions)  # Switch to the next solution
-        
-    
 if __name__ == '__main__':
+    # Solve level packs from the command line without starting the game
+    if len(sys.argv) > 1:
+        sys.exit(batch_main(sys.argv[1:]))
+
     # Initialize the game
     pygame.init()
 
@@ -780,11 +935,13 @@ if __name__ == '__main__':
     PINK = (255, 199, 199)
     LIGHT_PINK = (255, 226, 226)
     PURPLE = (135, 133, 162)
+    RED = (230, 80, 80)
 
     # Button settings
     BUTTON_WIDTH = 120
     BUTTON_HEIGHT = 50
     BUTTON_GAP = 30
+    LEVELS_PER_PAGE = 25
 
     # Font settings
     font_path = "Komigo3D-Regular.ttf"
@@ -797,12 +954,15 @@ if __name__ == '__main__':
     # Initialize the screen
     screen = pygame.display.set_mode(SCREEN_SIZE)
     pygame.display.set_caption("One Line Fill Puzzle")
+    scheduler = FrameScheduler(fps=60)
 
-    # Load the levels
-    with open('levels.json', 'r') as f:
-        levels = json.load(f)
+    # Load the levels, from the binary pack if there is one
+    levels = load_levels('levels.olf' if os.path.exists('levels.olf') else 'levels.json')
         
+    record_store = RecordStore('game_data.json', journal=True)
     levels_completed = load_game_data()
+    SOLUTION_CACHE = 'solution_cache.json'
+    prefetcher = Prefetcher(SOLUTION_CACHE)
     
     volume_icon = pygame.image.load('volume_icon_32.png').convert_alpha()
     star_icon = pygame.image.load('star.png').convert_alpha()
@@ -816,5 +976,5 @@ if __name__ == '__main__':
     knob_height = 20
 
     slider_rect = pygame.Rect(SCREEN_WIDTH // 2 - slider_width // 2, 550, slider_width, slider_height)  # The slider rectangle 
-    main_menu()
+    run_scenes(MainMenu())
 
@@ -0,0 +1,22 @@
+'''
+Core of the One Line Fill Puzzle: the level model, the solver and the tools built on it.
+It does not depend on pygame, so it can be used without a display.
+'''
+
+from .board import BLOCKED, EMPTY, FILLED, load_levels, PlayState, check_solution
+from .pack import PACK_MAGIC, PACK_VERSION, encode_level, decode_level, write_pack, is_pack, LevelPack, pack_main
+from .solver import (DIRECTIONS, Bitboard, check_parity, check_dead_end, iter_solutions, solve, order_moves,
+                     heuristic_solution, heuristic_search, count_solutions, moves_to_path)
+from .symmetry import transform_point, inverse_transform, transform_level, transform_moves, canonical_level
+from .cache import SOLVER_VERSION, MAX_CACHED, level_key, SolutionCache
+from .batch import split_level, batch_solve, batch_main
+from .levelio import write_levels
+from .generator import random_path, generate_level, generate_levels, generate_main
+from .difficulty import (DEFAULT_STAR_TIMES, search_stats, count_forced_moves, difficulty_score, analyze_level,
+                         star_times, rate_levels, rate_main)
+from .benchmark import (BENCH_SIZES, time_solutions, time_heuristic, measure_memory, bench_case, sweep_levels, run_benchmark,
+                        compare_results, bench_main)
+from .probe import PRUNE_REASONS, SearchProbe, probe_solutions, profile_main
+from .hints import HINT_NODE_LIMIT, HintEngine
+from .records import write_atomic, RecordStore
+from .background import solve_worker, SolverProcess, prefetch_worker, Prefetcher
@@ -0,0 +1,34 @@
+'''
+Run the batch solver, the level generator, the difficulty analyzer, the solver benchmark or the profiler:
+python -m onelinefill --solve levels.json
+python -m onelinefill --generate 1000 --out pack.json
+python -m onelinefill --rate pack.json --out rated.json
+python -m onelinefill --pack levels.json --out levels.olf
+python -m onelinefill --bench levels.json --out bench.json
+python -m onelinefill --profile levels.json --level 9 --folded trace.folded
+'''
+
+import sys
+
+from .batch import batch_main
+from .generator import generate_main
+from .difficulty import rate_main
+from .pack import pack_main
+from .benchmark import bench_main
+from .probe import profile_main
+
+if __name__ == '__main__':
+    argv = sys.argv[1:]
+    if '--generate' in argv:
+        main = generate_main
+    elif '--rate' in argv:
+        main = rate_main
+    elif '--pack' in argv or '--unpack' in argv:
+        main = pack_main
+    elif '--bench' in argv:
+        main = bench_main
+    elif '--profile' in argv:
+        main = profile_main
+    else:
+        main = batch_main
+    sys.exit(main(argv))
@@ -0,0 +1,271 @@
+'''
+Solving in a worker process, so the game keeps running while a level is searched.
+'''
+
+import os
+import time
+import signal
+import queue
+import multiprocessing
+from itertools import chain
+
+from .solver import heuristic_solution
+from .cache import SolutionCache
+
+# Positions searched for each step of a prefetch job, a hard level gives up instead of holding up the queue
+PREFETCH_NODE_LIMIT = 100000
+
+def reset_signals():
+    '''
+    Make SIGTERM stop a worker process by raising SystemExit.
+    A worker forked from the game inherits the handler of its display library, which would keep it
+    running when it is terminated, and the exception lets it remove the file it may be writing.
+    '''
+    signal.signal(signal.SIGTERM, stop_worker)
+
+def stop_worker(signum, frame):
+    '''Handler of SIGTERM in the worker processes'''
+    raise SystemExit(0)
+
+def solve_worker(grid, start, cache_path, permits, results):
+    '''
+    Search the solutions of a level in a worker process, one for every permit
+    
+    *** Parameters ***
+        grid: list - The level grid of 'o' and 'x' strings
+        start: list - The start position [x, y] of the level
+        cache_path: str - The solution cache file, None for no cache file
+        permits: multiprocessing.Semaphore - Released once for every solution that is wanted
+        results: multiprocessing.Queue - Receives the solutions, then None when there are no more
+    
+    *** Returns ***
+        None
+    '''
+    reset_signals()
+    try:
+        cache = SolutionCache(cache_path)
+        solutions = cache.iter_solutions(grid, start)
+        if cache.lookup(grid, start) is None:
+            # Show a solution found by the heuristic search first, it takes much less time on large levels
+            # than the first solutions of the depth-first search. Cached solutions come at once without it.
+            first = heuristic_solution(grid, start)
+            if first is not None:
+                solutions = chain([first], (moves for moves in solutions if moves != first))
+        while True:
+            permits.acquire()
+            moves = next(solutions, None)
+            if moves is None:
+                break
+            results.put(moves)
+    finally:
+        # End the solutions also when the search fails, so the game does not wait for them
+        results.put(None)
+
+class SolverProcess:
+    '''
+    Solutions of a level searched by a worker process, ahead of the one that is shown.
+    Nothing blocks: the solutions that have arrived are collected by poll(), and the search
+    can be stopped at any time by cancel().
+    
+    *** Parameters ***
+        grid: list - The level grid of 'o' and 'x' strings
+        start: list - The start position [x, y] of the level
+        cache_path: str - The solution cache file, None for no cache file
+        ahead: int - The number of solutions searched after the one that is shown
+    
+    *** Attributes ***
+        found: list - The solutions that have arrived
+        exhausted: bool - Whether all the solutions have arrived
+        cancelled: bool - Whether the search was stopped by cancel()
+    '''
+    def __init__(self, grid, start, cache_path=None, ahead=2):
+        self.ahead = ahead
+        self.found = []
+        self.exhausted = False
+        self.cancelled = False
+        self.requested = 0
+        self.started = time.perf_counter()
+        self.permits = multiprocessing.Semaphore(0)
+        self.results = multiprocessing.Queue()
+        self.process = multiprocessing.Process(target=solve_worker, daemon=True,
+                                               args=(grid, start, cache_path, self.permits, self.results))
+        self.process.start()
+        self.request(1 + ahead)
+
+    def request(self, n_solutions):
+        '''Ask the worker for the solutions up to n_solutions, if they are not asked for yet'''
+        while self.requested < n_solutions:
+            self.permits.release()
+            self.requested += 1
+
+    def poll(self):
+        '''
+        Collect the solutions that have arrived
+        
+        *** Returns ***
+            bool - True if a solution arrived or the search ended, False otherwise
+        '''
+        changed = False
+        # Everything a worker puts before it exits can be read after its exit code is set
+        exited = self.process.exitcode is not None
+        while not self.exhausted and not self.cancelled:
+            try:
+                moves = self.results.get_nowait()
+            except queue.Empty:
+                break
+            changed = True
+            if moves is None:
+                self.exhausted = True
+                self.process.join()
+            else:
+                self.found.append(moves)
+        if exited and not self.exhausted and not self.cancelled:
+            # The worker died without ending the solutions
+            self.exhausted = True
+            changed = True
+        return changed
+
+    @property
+    def busy(self):
+        '''Whether the worker is searching solutions that were asked for'''
+        return not self.exhausted and not self.cancelled and len(self.found) < self.requested
+
+    @property
+    def elapsed(self):
+        '''The time in s since the search started'''
+        return time.perf_counter() - self.started
+
+    def get(self, index):
+        '''
+        Get a solution if it has arrived
+        
+        *** Parameters ***
+            index: int - The index of the solution
+        
+        *** Returns ***
+            moves: str - The solution, None if it has not arrived or the level has fewer solutions
+        '''
+        return self.found[index] if index < len(self.found) else None
+
+    def next_index(self, index):
+        '''Index of the solution after index, going back to the first one after the last'''
+        if index + 1 < len(self.found):
+            # Keep the search ahead of the solution that is shown
+            self.request(index + 2 + self.ahead)
+            return index + 1
+        if self.exhausted or self.cancelled:
+            return 0
+        if index >= len(self.found):
+            # The solution that is shown has not arrived yet
+            return index
+        self.request(index + 2 + self.ahead)
+        return index + 1
+
+    def previous_index(self, index):
+        '''Index of the solution before index, going to the last one from the first if all are found'''
+        if index > 0:
+            return index - 1
+        return len(self.found) - 1 if self.exhausted and self.found else index
+
+    def cancel(self):
+        '''Stop the search'''
+        if not self.exhausted and not self.cancelled:
+            self.cancelled = True
+            self.process.terminate()
+            self.process.join()
+
+def prefetch_worker(cache_path, jobs, results):
+    '''
+    Solve the levels of the jobs at low priority and put their results in the solution cache
+    
+    *** Parameters ***
+        cache_path: str - The solution cache file
+        jobs: multiprocessing.Queue - The (level number, grid, start, whether to measure the difficulty) of
+            the levels to solve, None to stop
+        results: multiprocessing.Queue - Receives the (level number, difficulty or None) of every job
+    
+    *** Returns ***
+        None
+    '''
+    reset_signals()
+    if hasattr(os, 'nice'):
+        # Leave the processor to the game
+        os.nice(19)
+    while True:
+        job = jobs.get()
+        if job is None:
+            return
+        level, grid, start, rate = job
+        # Load the cache again for every job, the other workers may have saved it since
+        cache = SolutionCache(cache_path)
+        # The answer screen starts with the solutions that iter_solutions() caches
+        cache.prefill(grid, start, PREFETCH_NODE_LIMIT)
+        # Counting the solutions of a large level could hold up the levels queued after it,
+        # and the score does not depend on it
+        difficulty = cache.difficulty(grid, start, count=False, node_limit=PREFETCH_NODE_LIMIT) if rate else None
+        results.put((level, difficulty))
+
+class Prefetcher:
+    '''
+    Solves levels before the player asks for them, in a low priority worker process.
+    The solutions go to the solution cache file, where the answer screen finds them, and the
+    difficulty of the levels that have none is sent back to the game.
+    The levels are solved in the order they are asked for, one at a time.
+    
+    *** Parameters ***
+        cache_path: str - The solution cache file
+    
+    *** Attributes ***
+        difficulties: dict - The difficulty measured for each level number
+    '''
+    def __init__(self, cache_path='solution_cache.json'):
+        self.cache_path = cache_path
+        self.process = None
+        self.jobs = None
+        self.results = None
+        self.queued = set()
+        self.difficulties = {}
+
+    def prefetch(self, level, grid, start, rate=False):
+        '''
+        Ask for a level to be solved, if it was not asked for before
+        
+        *** Parameters ***
+            level: int - The level number
+            grid: list - The level grid of 'o' and 'x' strings
+            start: list - The start position [x, y] of the level
+            rate: bool - Whether to measure the difficulty of the level too
+        
+        *** Returns ***
+            None
+        '''
+        if level in self.queued:
+            return
+        if self.process is None:
+            # Start the worker with the first level
+            self.jobs = multiprocessing.Queue()
+            self.results = multiprocessing.Queue()
+            self.process = multiprocessing.Process(target=prefetch_worker, daemon=True,
+                                                   args=(self.cache_path, self.jobs, self.results))
+            self.process.start()
+        self.queued.add(level)
+        self.jobs.put((level, grid, start, rate))
+
+    def poll(self):
+        '''Collect the difficulties measured by the worker'''
+        if self.results is None:
+            return
+        while True:
+            try:
+                level, difficulty = self.results.get_nowait()
+            except queue.Empty:
+                return
+            if difficulty is not None:
+                self.difficulties[level] = difficulty
+
+    def close(self):
+        '''Stop the worker, dropping the levels it has not solved yet'''
+        if self.process is not None:
+            self.process.terminate()
+            self.process.join()
+            self.process = None
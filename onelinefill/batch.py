@@ -0,0 +1,158 @@
+'''
+Batch solver for level packs, run on a pool of processes without pygame.
+
+Usage: python -m onelinefill --solve levels.json --out results.jsonl
+'''
+
+import sys
+import json
+import time
+import argparse
+import multiprocessing
+
+from .board import load_levels
+from .solver import DIRECTIONS, iter_solutions, count_solutions
+
+def split_level(grid, start):
+    '''
+    Split the search of a level by its first moves.
+    A path that starts with a move is a path of the rest of the grid from the next cell,
+    so each first move is an independent level with the start cell blocked.
+    
+    *** Parameters ***
+        grid: list - The level grid of 'o' and 'x' strings
+        start: list - The start position [x, y] of the level
+    
+    *** Returns ***
+        parts: list - The (first move, grid, start) of every part
+    '''
+    x, y = start
+    rest = [list(row) for row in grid]
+    rest[y][x] = 'x'
+    parts = []
+    for move, d_row, d_col in DIRECTIONS:
+        next_x, next_y = x + d_col, y + d_row
+        if 0 <= next_y < len(grid) and 0 <= next_x < len(grid[0]) and grid[next_y][next_x] == 'o':
+            parts.append((move, rest, [next_x, next_y]))
+    return parts
+
+def solve_part(task):
+    '''
+    Solve one part of a level in a worker process
+    
+    *** Parameters ***
+        task: tuple - (level number, first move, grid, start, whether to count the solutions)
+    
+    *** Returns ***
+        result: tuple - (level number, first move, first solution or None, solution count or None, time in s)
+    '''
+    level, first_move, grid, start, count = task
+    begin = time.perf_counter()
+    moves = next(iter_solutions(grid, start), None)
+    first_solution = None if moves is None else first_move + moves
+    n = count_solutions(grid, start) if count else None
+    return level, first_move, first_solution, n, time.perf_counter() - begin
+
+def batch_solve(levels, out_file, workers=None, count=True, split_cells=49):
+    '''
+    Solve a level pack on a pool of processes and write one JSON line per level as it is finished
+    
+    *** Parameters ***
+        levels: list - The levels, in the format of levels.json
+        out_file: file - The file to write the results to
+        workers: int - The number of processes (None for all the cores)
+        count: bool - Whether to count all the solutions of every level
+        split_cells: int - Levels with at least this many free cells are split by their first moves
+    
+    *** Returns ***
+        n_solvable: int - The number of solvable levels
+    '''
+    tasks = []
+    n_parts = {}
+    for i, level in enumerate(levels, 1):
+        grid, start = level["grid"], level["start"]
+        x, y = start
+        n_free = sum(row.count('o') for row in grid)
+        if n_free >= split_cells and grid[y][x] == 'o':
+            parts = split_level(grid, start)
+        else:
+            parts = [('', grid, start)]
+        n_parts[i] = len(parts)
+        tasks.extend((i, move, part_grid, part_start, count) for move, part_grid, part_start in parts)
+
+    # Results of the levels that are not finished yet
+    pending = {}
+    n_solvable = 0
+    for i, parts in n_parts.items():
+        if parts == 0:
+            # The start cell has no free neighbor
+            n_solvable += write_batch_result(out_file, i, levels[i - 1], [], count)
+    with multiprocessing.Pool(workers) as pool:
+        for result in pool.imap_unordered(solve_part, tasks):
+            i = result[0]
+            pending.setdefault(i, []).append(result)
+            if len(pending[i]) == n_parts[i]:
+                n_solvable += write_batch_result(out_file, i, levels[i - 1], pending.pop(i), count)
+    return n_solvable
+
+def write_batch_result(out_file, i, level, results, count):
+    '''
+    Combine the results of the parts of a level and write them as a JSON line
+    
+    *** Parameters ***
+        out_file: file - The file to write the result to
+        i: int - The level number
+        level: dict - The level
+        results: list - The results of solve_part() for all the parts of the level
+        count: bool - Whether the solutions were counted
+    
+    *** Returns ***
+        bool - True if the level is solvable, False otherwise
+    '''
+    grid, (x, y) = level["grid"], level["start"]
+    if not results and grid[y][x] == 'o' and sum(row.count('o') for row in grid) == 1:
+        # A single cell is solved without moving
+        results = [(i, '', '', 1 if count else None, 0.0)]
+    # Keep the first solution in the order of the moves
+    order = {move: k for k, (move, _, _) in enumerate(DIRECTIONS)}
+    results.sort(key=lambda result: order.get(result[1], -1))
+    first_solution = next((result[2] for result in results if result[2] is not None), None)
+    record = {
+        "level": i,
+        "solvable": first_solution is not None,
+        "solutions": sum(result[3] for result in results) if count else None,
+        "first_solution": first_solution,
+        "time": round(sum(result[4] for result in results), 6),
+    }
+    out_file.write(json.dumps(record) + '\n')
+    out_file.flush()
+    return first_solution is not None
+
+def batch_main(argv):
+    '''
+    Command line entry point of the batch solver, it does not open a window or play sounds
+    
+    *** Parameters ***
+        argv: list - The command line arguments
+    
+    *** Returns ***
+        int - The exit status
+    '''
+    parser = argparse.ArgumentParser(description="Solve a level pack without starting the game.")
+    parser.add_argument('--solve', metavar='LEVELS', required=True, help="level pack, in the format of levels.json or binary")
+    parser.add_argument('--out', metavar='FILE', default='-', help="JSON lines output file (default: stdout)")
+    parser.add_argument('--workers', type=int, default=None, help="number of processes (default: all cores)")
+    parser.add_argument('--no-count', action='store_true', help="do not count all the solutions")
+    parser.add_argument('--split-cells', type=int, default=49,
+                        help="split levels with at least this many free cells by their first moves")
+    args = parser.parse_args(argv)
+
+    levels = load_levels(args.solve)
+    out_file = sys.stdout if args.out == '-' else open(args.out, 'w')
+    try:
+        n_solvable = batch_solve(levels, out_file, args.workers, not args.no_count, args.split_cells)
+    finally:
+        if out_file is not sys.stdout:
+            out_file.close()
+    print(f"{n_solvable}/{len(levels)} levels solvable.", file=sys.stderr)
+    return 0 if n_solvable == len(levels) else 1
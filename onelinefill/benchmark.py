@@ -0,0 +1,309 @@
+'''
+Benchmark of the solver on a level pack and on random levels of growing size.
+Every case runs in its own process, so a level the solver cannot finish in time is stopped
+and memory measurements do not depend on the cases before it.
+
+Usage: python -m onelinefill --bench levels.json --out bench.json
+       python -m onelinefill --bench levels.json --baseline bench.json --threshold 0.25
+'''
+
+import sys
+import json
+import time
+import queue
+import random
+import platform
+import statistics
+import argparse
+import tracemalloc
+import multiprocessing
+
+from .board import load_levels
+from .solver import iter_solutions, heuristic_solution
+from .generator import generate_level
+from .difficulty import search_stats
+
+BENCH_VERSION = 2
+# Sizes of the random levels, from 4x4 to 16x16
+BENCH_SIZES = (4, 6, 8, 10, 12, 14, 16)
+# Times shorter than this in s are too noisy to be compared with the baseline
+MIN_COMPARED_TIME = 0.1
+# A time is a regression only if it is also this much longer in s than in the baseline
+MIN_SLOWDOWN = 0.05
+
+def time_solutions(grid, start, max_solutions, time_limit):
+    '''
+    Time the search of the solutions of a level
+    
+    *** Parameters ***
+        grid: list - The level grid of 'o' and 'x' strings
+        start: list - The start position [x, y] of the level
+        max_solutions: int - Stop after finding this many solutions
+        time_limit: float - Stop after the first solution found after this time in s
+    
+    *** Returns ***
+        run: tuple - (time in s to the first solution or None, total time in s, number of solutions,
+            whether all the solutions were found)
+    '''
+    first_time = None
+    n_solutions = 0
+    exhausted = True
+    begin = time.perf_counter()
+    for _ in iter_solutions(grid, start):
+        n_solutions += 1
+        elapsed = time.perf_counter() - begin
+        if first_time is None:
+            first_time = elapsed
+        if n_solutions >= max_solutions or elapsed > time_limit:
+            exhausted = False
+            break
+    return first_time, time.perf_counter() - begin, n_solutions, exhausted
+
+def time_heuristic(grid, start):
+    '''Time the search of one solution of a level by heuristic_solution(), in s'''
+    begin = time.perf_counter()
+    heuristic_solution(grid, start)
+    return time.perf_counter() - begin
+
+def measure_memory(grid, start, n_solutions):
+    '''
+    Measure the peak memory allocated while searching the solutions of a level
+    
+    *** Parameters ***
+        grid: list - The level grid of 'o' and 'x' strings
+        start: list - The start position [x, y] of the level
+        n_solutions: int - The number of solutions to search
+    
+    *** Returns ***
+        peak_kb: float - The peak of the memory allocated by the search in KB
+    '''
+    tracemalloc.start()
+    try:
+        solutions = iter_solutions(grid, start)
+        for _ in range(n_solutions):
+            next(solutions, None)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return round(peak / 1024, 1)
+
+def bench_worker(grid, start, max_solutions, time_limit, repeat, node_limit, results):
+    '''
+    Run one case of the benchmark in a worker process
+    
+    *** Parameters ***
+        grid: list - The level grid of 'o' and 'x' strings
+        start: list - The start position [x, y] of the level
+        max_solutions: int - Stop after finding this many solutions
+        time_limit: float - Stop after the first solution found after this time in s
+        repeat: int - The number of timed runs, the median one is kept
+        node_limit: int - Stop counting the positions of the first search after this many
+        results: multiprocessing.Queue - Receives the time of the heuristic search, None after every timed run,
+            then the other measurements of the case
+    
+    *** Returns ***
+        None
+    '''
+    # The heuristic search goes first, it is timed even on the levels the depth-first search cannot finish
+    heuristic_time = statistics.median(time_heuristic(grid, start) for _ in range(repeat))
+    results.put({"heuristic_time": round(heuristic_time, 6)})
+    runs = []
+    for _ in range(repeat):
+        runs.append(time_solutions(grid, start, max_solutions, time_limit))
+        results.put(None)
+    # The median run is steadier than the fastest one from one benchmark to the next
+    first_time, total_time, n_solutions, exhausted = sorted(runs, key=lambda run: run[1])[len(runs) // 2]
+    # search_stats() searches the first solution in the same order as iter_solutions()
+    nodes = search_stats(grid, start, node_limit)["nodes"]
+    results.put({
+        "first_time": None if first_time is None else round(first_time, 6),
+        "time": round(total_time, 6),
+        "solutions": n_solutions,
+        "exhausted": exhausted,
+        "solutions_per_s": round(n_solutions / total_time, 1) if total_time > 0 else None,
+        "nodes": nodes,
+        "peak_kb": measure_memory(grid, start, max(1, n_solutions)),
+    })
+
+def bench_case(name, grid, start, max_solutions=1000, time_limit=5.0, repeat=5, node_limit=1000000):
+    '''
+    Measure the solver on one level, stopping it if it does not finish in time
+    
+    *** Parameters ***
+        name: str - The name of the case, which matches it with the baseline
+        grid: list - The level grid of 'o' and 'x' strings
+        start: list - The start position [x, y] of the level
+        max_solutions: int - Stop after finding this many solutions
+        time_limit: float - Stop after the first solution found after this time in s
+        repeat: int - The number of timed runs, the median one is kept
+        node_limit: int - Stop counting the positions of the first search after this many
+    
+    *** Returns ***
+        record: dict - The measurements of the case, with "timeout" True if the worker was stopped
+    '''
+    record = {"name": name, "size": f"{len(grid)}x{len(grid[0])}",
+              "cells": sum(row.count('o') for row in grid), "timeout": False}
+    results = multiprocessing.Queue()
+    process = multiprocessing.Process(target=bench_worker, daemon=True,
+                                      args=(grid, start, max_solutions, time_limit, repeat, node_limit, results))
+    process.start()
+    try:
+        # A run may go over the time limit by the search of one solution, give up when one takes twice as long
+        while "time" not in record:
+            measurements = results.get(timeout=2 * time_limit + 5)
+            if measurements is not None:
+                record.update(measurements)
+    except queue.Empty:
+        record["timeout"] = True
+        process.terminate()
+    process.join()
+    return record
+
+def sweep_levels(sizes=BENCH_SIZES, n_boards=2, density=0.1, seed=0):
+    '''
+    Generate the random levels of the benchmark, the same ones for the same seed
+    
+    *** Parameters ***
+        sizes: iterable - The sizes of the square levels
+        n_boards: int - The number of levels of each size
+        density: float - The fraction of the cells that are blocked
+        seed: int - The seed of the levels
+    
+    *** Returns ***
+        cases: list - The (name, level) of every level
+    '''
+    cases = []
+    for size in sizes:
+        for i in range(n_boards):
+            rng = random.Random(seed * 1000003 + size * 1000 + i)
+            cases.append((f"random {size}x{size} #{i + 1}", generate_level(size, size, density, rng=rng)))
+    return cases
+
+def run_benchmark(cases, max_solutions=1000, time_limit=5.0, repeat=5, node_limit=1000000, log=None):
+    '''
+    Run the benchmark on a list of levels
+    
+    *** Parameters ***
+        cases: list - The (name, level) of every level
+        max_solutions: int - Stop after finding this many solutions of a level
+        time_limit: float - Stop searching more solutions of a level after this time in s
+        repeat: int - The number of timed runs of every level
+        node_limit: int - Stop counting the positions of the first search after this many
+        log: file - Where to print the progress, None for no progress
+    
+    *** Returns ***
+        results: dict - The description of the machine and the record of every case
+    '''
+    records = []
+    for name, level in cases:
+        record = bench_case(name, level["grid"], level["start"], max_solutions, time_limit, repeat, node_limit)
+        records.append(record)
+        if log is not None:
+            print(format_record(record), file=log, flush=True)
+    return {
+        "version": BENCH_VERSION,
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "settings": {"max_solutions": max_solutions, "time_limit": time_limit, "repeat": repeat},
+        "cases": records,
+    }
+
+def format_record(record):
+    '''Format the record of a case as a line of the progress table'''
+    heuristic_time = '-' if "heuristic_time" not in record else f"{1000 * record['heuristic_time']:.2f}"
+    if record["timeout"]:
+        return f"{record['name']:<18} {record['size']:>6} timeout  heuristic {heuristic_time:>9} ms"
+    first_time = '-' if record["first_time"] is None else f"{1000 * record['first_time']:.2f}"
+    return (f"{record['name']:<18} {record['size']:>6} first {first_time:>9} ms  total {1000 * record['time']:>9.2f} ms"
+            f"  {record['solutions']:>5} sol{'' if record['exhausted'] else '+'}"
+            f"  {record['solutions_per_s'] or 0:>10.1f} sol/s  {record['nodes']:>8} nodes  {record['peak_kb']:>8.1f} KB"
+            f"  heuristic {heuristic_time:>9} ms")
+
+def compare_results(results, baseline, threshold=0.25):
+    '''
+    Find the cases that got slower than in a baseline.
+    The positions searched do not depend on the machine and are always compared. The times are only
+    compared above MIN_COMPARED_TIME, with a baseline of the same benchmark version, and a slowdown must
+    be both over the threshold and over MIN_SLOWDOWN, so the noise of short runs does not fail the check.
+    
+    *** Parameters ***
+        results: dict - The results of run_benchmark()
+        baseline: dict - Results of run_benchmark() saved earlier
+        threshold: float - The allowed slowdown, as a fraction of the baseline
+    
+    *** Returns ***
+        regressions: list - The descriptions of the regressions
+    '''
+    previous = {record["name"]: record for record in baseline["cases"]}
+    # Older versions kept the fastest run instead of the median one
+    compare_times = baseline.get("version") == BENCH_VERSION
+    regressions = []
+    for record in results["cases"]:
+        old = previous.get(record["name"])
+        if old is None:
+            continue
+        name = record["name"]
+        if record["timeout"] and not old["timeout"]:
+            regressions.append(f"{name}: timeout, {1000 * old['time']:.2f} ms in the baseline")
+        keys = ["heuristic_time"] if compare_times else []
+        if not record["timeout"] and not old["timeout"]:
+            # The positions searched do not depend on the machine, any increase is a change of the search
+            if record["nodes"] > old["nodes"]:
+                regressions.append(f"{name}: {record['nodes']} nodes, {old['nodes']} in the baseline")
+            if compare_times:
+                keys += ["first_time", "time"]
+        for key in keys:
+            new_time, old_time = record.get(key), old.get(key)
+            if new_time is None or old_time is None or max(new_time, old_time) < MIN_COMPARED_TIME:
+                continue
+            if new_time > old_time * (1 + threshold) and new_time - old_time > MIN_SLOWDOWN:
+                regressions.append(f"{name}: {key} {1000 * new_time:.2f} ms, "
+                                   f"{1000 * old_time:.2f} ms in the baseline (+{100 * (new_time / old_time - 1):.0f}%)")
+    return regressions
+
+def bench_main(argv):
+    '''
+    Command line entry point of the solver benchmark
+    
+    *** Parameters ***
+        argv: list - The command line arguments
+    
+    *** Returns ***
+        int - The exit status, 1 if a case got slower than in the baseline
+    '''
+    parser = argparse.ArgumentParser(description="Measure the speed of the solver.")
+    parser.add_argument('--bench', metavar='LEVELS', required=True, help="level pack, in the format of levels.json or binary")
+    parser.add_argument('--out', metavar='FILE', default=None, help="JSON results output file, '-' for stdout")
+    parser.add_argument('--baseline', metavar='FILE', default=None, help="results of an earlier run to compare with")
+    parser.add_argument('--threshold', type=float, default=0.25,
+                        help="allowed slowdown from the baseline, as a fraction (default: 0.25)")
+    parser.add_argument('--sizes', type=int, nargs='*', default=list(BENCH_SIZES),
+                        help="sizes of the random square levels (default: 4 6 ... 16), none to skip them")
+    parser.add_argument('--boards', type=int, default=2, help="number of random levels of each size (default: 2)")
+    parser.add_argument('--density', type=float, default=0.1, help="fraction of blocked cells of the random levels")
+    parser.add_argument('--seed', type=int, default=0, help="seed of the random levels (default: 0)")
+    parser.add_argument('--max-solutions', type=int, default=1000, help="solutions searched per level (default: 1000)")
+    parser.add_argument('--time-limit', type=float, default=5.0, help="search time per level in s (default: 5)")
+    parser.add_argument('--repeat', type=int, default=5, help="timed runs per level, the median is kept (default: 5)")
+    args = parser.parse_args(argv)
+
+    cases = [(f"level {i}", level) for i, level in enumerate(load_levels(args.bench), 1)]
+    cases += sweep_levels(args.sizes, args.boards, args.density, args.seed)
+    results = run_benchmark(cases, args.max_solutions, args.time_limit, args.repeat, log=sys.stderr)
+    if args.out is not None:
+        out_file = sys.stdout if args.out == '-' else open(args.out, 'w')
+        try:
+            json.dump(results, out_file, indent=4)
+            out_file.write('\n')
+        finally:
+            if out_file is not sys.stdout:
+                out_file.close()
+
+    if args.baseline is None:
+        return 0
+    with open(args.baseline, 'r') as file:
+        regressions = compare_results(results, json.load(file), args.threshold)
+    for regression in regressions:
+        print(f"Regression: {regression}", file=sys.stderr)
+    print(f"{len(regressions)} regressions from {args.baseline}.", file=sys.stderr)
+    return 1 if regressions else 0
@@ -0,0 +1,146 @@
+'''
+Model of a level being played: the grid, the moves of the player and the win condition.
+'''
+
+import json
+
+from .pack import is_pack, LevelPack
+
+# Values of the cells of a grid being played
+BLOCKED = -1
+EMPTY = 0
+FILLED = 1
+
+def load_levels(path='levels.json'):
+    '''
+    Load the levels from a file
+    
+    *** Parameters ***
+        path: str - The level file, a JSON list of {"grid", "start"} objects or a binary level pack
+    
+    *** Returns ***
+        levels: list - The levels, a LevelPack that decodes them on access for a binary pack
+    '''
+    if is_pack(path):
+        return LevelPack(path)
+    with open(path, 'r') as file:
+        return json.load(file)
+
+class PlayState:
+    '''
+    State of a level being played.
+    The filled cells are counted and the line is kept as it changes, so every move,
+    undo and win check takes constant time.
+    
+    *** Parameters ***
+        grid: list - The level grid of 'o' and 'x' strings
+        start: list - The start position [x, y] of the level
+    
+    *** Attributes ***
+        current_grid: list - The cells of the grid, BLOCKED, EMPTY or FILLED
+        start_x, start_y: int - The start position
+        path: list - The (x, y) positions of the line, from the start to the cursor
+        grid_fill_count: int - The number of cells to fill
+        current_fill_count: int - The number of filled cells
+    '''
+    def __init__(self, grid, start):
+        self.start_x, self.start_y = start
+        # Initialize the grid
+        self.current_grid = [[EMPTY for _ in range(len(grid[0]))] for _ in range(len(grid))]
+        # Fill the grid based on the level configuration
+        n_blocked = 0
+        for y, row in enumerate(grid):
+            for x, cell in enumerate(row):
+                if cell == 'x':
+                    n_blocked += 1
+                    self.current_grid[y][x] = BLOCKED
+        self.grid_fill_count = len(self.current_grid) * len(self.current_grid[0]) - n_blocked
+        # Set the start position
+        self.current_grid[self.start_y][self.start_x] = FILLED
+        self.current_fill_count = 1
+        self.path = [(self.start_x, self.start_y)]
+
+    @property
+    def cursor_x(self):
+        '''The x-coordinate of the cursor, the end of the line'''
+        return self.path[-1][0]
+
+    @property
+    def cursor_y(self):
+        '''The y-coordinate of the cursor, the end of the line'''
+        return self.path[-1][1]
+
+    def move(self, dx, dy):
+        '''
+        Move the cursor by one cell. Moving back onto the previous cell removes the last cell of the line.
+        
+        *** Parameters ***
+            dx: int - The move in x, -1, 0 or 1
+            dy: int - The move in y, -1, 0 or 1
+        
+        *** Returns ***
+            bool - True if the cursor moved, False otherwise
+        '''
+        x, y = self.cursor_x + dx, self.cursor_y + dy
+        # If out of bounds, do nothing
+        if not (0 <= y < len(self.current_grid) and 0 <= x < len(self.current_grid[0])):
+            return False
+        # If the cell cannot be filled, do nothing
+        if self.current_grid[y][x] == BLOCKED:
+            return False
+        # If the cell is the previous cell, remove the current cell
+        if len(self.path) > 1 and (x, y) == self.path[-2]:
+            self.undo()
+        # If the cell is filled and not the previous cell, do nothing
+        elif self.current_grid[y][x] == FILLED:
+            return False
+        else:
+            # Add the cell to the path
+            self.path.append((x, y))
+            self.current_grid[y][x] = FILLED
+            self.current_fill_count += 1
+        return True
+
+    def undo(self):
+        '''Remove the last cell of the line'''
+        if len(self.path) > 1:
+            x, y = self.path.pop()
+            self.current_grid[y][x] = EMPTY
+            self.current_fill_count -= 1
+
+    def reset(self):
+        '''Clear the line back to the start position'''
+        for x, y in self.path[1:]:
+            self.current_grid[y][x] = EMPTY
+        self.path = [(self.start_x, self.start_y)]
+        self.current_fill_count = 1
+
+    def is_complete(self):
+        '''Check if all the cells are filled'''
+        return self.current_fill_count == self.grid_fill_count
+
+def check_solution(grid, start, moves):
+    '''
+    Check that a move string of 'R', 'D', 'L' and 'U' solves a level
+    
+    *** Parameters ***
+        grid: list - The level grid of 'o' and 'x' strings
+        start: list - The start position [x, y] of the level
+        moves: str - The moves to check
+    
+    *** Returns ***
+        bool - True if the moves fill the grid with one line, False otherwise
+    '''
+    x, y = start
+    if not (0 <= y < len(grid) and 0 <= x < len(grid[0])) or grid[y][x] != 'o':
+        return False
+    state = PlayState(grid, start)
+    steps = {'R': (1, 0), 'D': (0, 1), 'L': (-1, 0), 'U': (0, -1)}
+    for move in moves:
+        if move not in steps:
+            return False
+        n_cells = len(state.path)
+        # Every move has to add a new cell to the line
+        if not state.move(*steps[move]) or len(state.path) <= n_cells:
+            return False
+    return state.is_complete()
@@ -0,0 +1,269 @@
+'''
+Cache of the solver results, in memory and in a file.
+'''
+
+import json
+import hashlib
+from collections import OrderedDict
+from itertools import islice
+
+from .solver import iter_solutions, solve, count_solutions
+from .difficulty import analyze_level
+from .probe import SearchProbe, probe_solutions
+from .records import write_atomic
+from .symmetry import canonical_level, inverse_transform, transform_moves
+
+# Version of the solver output, stored in the solution cache file.
+# Increase it whenever solve() may return different solutions for the same level.
+SOLVER_VERSION = 3
+# Number of first solutions of a level stored by iter_solutions()
+MAX_CACHED = 3
+
+def level_key(grid, start):
+    '''
+    Compute a canonical hash of a level
+    
+    *** Parameters ***
+        grid: list - The level grid of 'o' and 'x' strings
+        start: list - The start position [x, y] of the level
+    
+    *** Returns ***
+        str - The hex digest identifying the level
+    '''
+    rows = '/'.join(''.join('x' if cell == 'x' else 'o' for cell in row) for row in grid)
+    return hashlib.sha1(f"{rows}@{start[0]},{start[1]}".encode()).hexdigest()
+
+class SolutionCache:
+    '''
+    Cache of solver results with an in-memory LRU tier and a persistent file tier
+    
+    *** Parameters ***
+        path: str - The cache file, None to keep the cache in memory only
+        capacity: int - The number of entries kept in memory
+    '''
+    def __init__(self, path='solution_cache.json', capacity=64):
+        self.path = path
+        self.capacity = capacity
+        self.memory = OrderedDict()
+        self.stored = None  # Entries of the cache file, loaded on the first miss
+
+    def load(self):
+        '''Load the entries of the cache file, dropping them if they come from another solver version'''
+        self.stored = {}
+        if self.path is None:
+            return
+        try:
+            with open(self.path, 'r') as file:
+                data = json.load(file)
+        except (OSError, ValueError):
+            # A missing or unreadable file is an empty cache
+            return
+        if not isinstance(data, dict) or data.get('version') != SOLVER_VERSION:
+            return
+        solutions = data.get('solutions')
+        if isinstance(solutions, dict):
+            self.stored = solutions
+
+    def save(self):
+        '''Write the file tier to disk, keeping the cache in memory only if the file cannot be written'''
+        if self.path is None:
+            return
+        # Other processes may have saved the file since it was loaded, keep their entries
+        entries = self.stored
+        self.load()
+        self.stored.update(entries)
+        # The file is replaced atomically, as it may be saved by several solver processes
+        try:
+            write_atomic(self.path, json.dumps({'version': SOLVER_VERSION, 'solutions': self.stored}))
+        except OSError:
+            pass
+
+    def get(self, key):
+        '''
+        Look up a cached result
+        
+        *** Parameters ***
+            key: str - The cache key
+        
+        *** Returns ***
+            value - The cached result, None if it is not cached
+        '''
+        if key in self.memory:
+            self.memory.move_to_end(key)
+            return self.memory[key]
+        if self.stored is None:
+            self.load()
+        if key in self.stored:
+            self.remember(key, self.stored[key])
+            return self.stored[key]
+        return None
+
+    def put(self, key, value):
+        '''
+        Store a result in both tiers
+        
+        *** Parameters ***
+            key: str - The cache key
+            value - The result, must be JSON serializable
+        
+        *** Returns ***
+            None
+        '''
+        if self.stored is None:
+            self.load()
+        self.remember(key, value)
+        self.stored[key] = value
+        self.save()
+
+    def remember(self, key, value):
+        '''Put an entry in the memory tier, evicting the least recently used one'''
+        self.memory[key] = value
+        self.memory.move_to_end(key)
+        if len(self.memory) > self.capacity:
+            self.memory.popitem(last=False)
+
+    def solve(self, grid, start, max_solutions=3):
+        '''
+        Find the solutions of a level, solving it only if it is not cached
+        
+        *** Parameters ***
+            grid: list - The level grid of 'o' and 'x' strings
+            start: list - The start position [x, y] of the level
+            max_solutions: int - Stop after finding this many solutions (None for all)
+        
+        *** Returns ***
+            solutions: list - The solutions as move strings
+        '''
+        # Solve the canonical form and map the solutions back to the level
+        canonical_grid, canonical_start, t = canonical_level(grid, start)
+        key = f"{level_key(canonical_grid, canonical_start)}:{max_solutions}"
+        solutions = self.get(key)
+        if solutions is None:
+            solutions = solve(canonical_grid, canonical_start, max_solutions)
+            self.put(key, solutions)
+        back = inverse_transform(t)
+        return [transform_moves(moves, back) for moves in solutions]
+
+    def lookup(self, grid, start, max_solutions=MAX_CACHED):
+        '''
+        Get the cached solutions of a level, without solving it
+        
+        *** Parameters ***
+            grid: list - The level grid of 'o' and 'x' strings
+            start: list - The start position [x, y] of the level
+            max_solutions: int - The number of solutions of the cache entry
+        
+        *** Returns ***
+            solutions: list - The solutions as move strings, None if they are not cached
+        '''
+        canonical_grid, canonical_start, t = canonical_level(grid, start)
+        solutions = self.get(f"{level_key(canonical_grid, canonical_start)}:{max_solutions}")
+        if solutions is None:
+            return None
+        back = inverse_transform(t)
+        return [transform_moves(moves, back) for moves in solutions]
+
+    def count(self, grid, start):
+        '''
+        Count the solutions of a level, counting them only if the count is not cached
+        
+        *** Parameters ***
+            grid: list - The level grid of 'o' and 'x' strings
+            start: list - The start position [x, y] of the level
+        
+        *** Returns ***
+            int - The number of solutions
+        '''
+        canonical_grid, canonical_start, _ = canonical_level(grid, start)
+        key = f"{level_key(canonical_grid, canonical_start)}:count"
+        count = self.get(key)
+        if count is None:
+            count = count_solutions(canonical_grid, canonical_start)
+            self.put(key, count)
+        return count
+
+    def prefill(self, grid, start, node_limit, max_cached=MAX_CACHED):
+        '''
+        Cache the first solutions of a level like iter_solutions(), giving up after a number of positions
+        
+        *** Parameters ***
+            grid: list - The level grid of 'o' and 'x' strings
+            start: list - The start position [x, y] of the level
+            node_limit: int - Give up after searching this many positions
+            max_cached: int - The number of solutions that are cached
+        
+        *** Returns ***
+            bool - True if the solutions are cached, False if the search gave up
+        '''
+        canonical_grid, canonical_start, _ = canonical_level(grid, start)
+        key = f"{level_key(canonical_grid, canonical_start)}:{max_cached}"
+        if self.get(key) is not None:
+            return True
+        # probe_solutions() finds the solutions in the same order as iter_solutions() and stops at the node limit
+        probe = SearchProbe(fold_depth=0, node_limit=node_limit)
+        solutions = list(islice(probe_solutions(canonical_grid, canonical_start, probe), max_cached))
+        if len(solutions) < max_cached and probe.nodes >= node_limit:
+            # The level may have more solutions, it is left to the answer screen
+            return False
+        self.put(key, solutions)
+        return True
+
+    def difficulty(self, grid, start, count=True, node_limit=1000000):
+        '''
+        Measure the difficulty of a level, measuring it only if it is not cached
+        
+        *** Parameters ***
+            grid: list - The level grid of 'o' and 'x' strings
+            start: list - The start position [x, y] of the level
+            count: bool - Whether to count the solutions, which takes long on large levels
+            node_limit: int - Stop the search of the first solution after this many positions
+        
+        *** Returns ***
+            difficulty: dict - The difficulty from analyze_level(), None if the level has no solution
+                or the search of its first solution reached the node limit
+        '''
+        # The search statistics depend on the orientation of the level, so it is not made canonical
+        key = f"{level_key(grid, start)}:difficulty" + ('' if count else ':no-count')
+        difficulty = self.get(key)
+        if difficulty is None:
+            difficulty = analyze_level(grid, start, count, node_limit)
+            # None is a miss, a level without a difficulty is stored as False so it is not analyzed again
+            self.put(key, False if difficulty is None else difficulty)
+        return difficulty or None
+
+    def iter_solutions(self, grid, start, max_cached=MAX_CACHED):
+        '''
+        Generate the solutions of a level one by one, as soon as they are found.
+        The first solutions come from the cache, the rest are searched only when they are asked for.
+        The first max_cached solutions are cached once they are all found or the search ends.
+        
+        *** Parameters ***
+            grid: list - The level grid of 'o' and 'x' strings
+            start: list - The start position [x, y] of the level
+            max_cached: int - The number of solutions that are cached
+        
+        *** Yields ***
+            moves: str - A solution as a move string
+        '''
+        canonical_grid, canonical_start, t = canonical_level(grid, start)
+        back = inverse_transform(t)
+        key = f"{level_key(canonical_grid, canonical_start)}:{max_cached}"
+        cached = self.get(key)
+        if cached is not None:
+            yield from (transform_moves(moves, back) for moves in cached)
+            if len(cached) < max_cached:
+                return
+            # The search is deterministic, so skip the cached solutions and continue
+            for moves in islice(iter_solutions(canonical_grid, canonical_start), max_cached, None):
+                yield transform_moves(moves, back)
+            return
+        # Same entry as solve(), which takes the first solutions of iter_solutions()
+        found = []
+        for moves in iter_solutions(canonical_grid, canonical_start):
+            if len(found) < max_cached:
+                found.append(moves)
+                if len(found) == max_cached:
+                    self.put(key, found)
+            yield transform_moves(moves, back)
+        if len(found) < max_cached:
+            self.put(key, found)
@@ -0,0 +1,223 @@
+'''
+Difficulty of the levels, measured on the search tree of the solver.
+
+Usage: python -m onelinefill --rate levels.json --out rated.json
+'''
+
+import sys
+import math
+import argparse
+
+from .board import load_levels
+from .solver import Bitboard, check_dead_end, count_solutions
+from .probe import SearchProbe, probe_solutions
+from .levelio import write_levels
+
+# Times in s to get 3 and 2 stars on a level without a difficulty score
+DEFAULT_STAR_TIMES = (30, 60)
+# Time in s to get 3 stars for each point of difficulty, and the shortest time
+SECONDS_PER_POINT = 2
+MIN_STAR_TIME = 10
+
+def search_stats(grid, start, node_limit=1000000):
+    '''
+    Search the first solution of a level like iter_solutions() and measure the search tree.
+    The search is run by probe_solutions(), whose callbacks follow the positions on the current path.
+    
+    *** Parameters ***
+        grid: list - The level grid of 'o' and 'x' strings
+        start: list - The start position [x, y] of the level
+        node_limit: int - Stop the search after this many positions
+    
+    *** Returns ***
+        stats: dict - The search statistics:
+            nodes: int - The number of positions visited, the start included
+            branching: float - The mean number of moves tried from a position that is searched
+            dead_ends: int - The number of positions cut by the pruning or left without a move
+            wrong_moves: int - The number of moves tried from the solution path before the right one
+            dead_end_depth: float - The mean number of moves a wrong move leads to before it fails
+            solution: str - The first solution, None if there is none or the node limit was reached
+    '''
+    # For every position of the current path: [deepest depth reached below it,
+    # number of failed moves, total depth of the failed moves]
+    path = []
+    counts = {"searched": 0, "dead_ends": 0}  # Positions whose moves are tried, positions that failed
+
+    def on_node(depth, cell):
+        if path:
+            parent = path[-1]
+            if parent[0] < depth:
+                # The first move tried from the parent
+                counts["searched"] += 1
+            parent[0] = max(parent[0], depth)
+        path.append([depth, 0, 0])
+
+    def on_prune(reason, depth, cell):
+        path.pop()
+        counts["dead_ends"] += 1
+        if path:
+            path[-1][1] += 1
+            path[-1][2] += 1
+
+    def on_backtrack(depth):
+        deepest, _, _ = path.pop()
+        if deepest <= depth:
+            # Every move failed without being tried
+            counts["searched"] += 1
+            counts["dead_ends"] += 1
+        if path:
+            parent = path[-1]
+            parent[0] = max(parent[0], deepest)
+            parent[1] += 1
+            parent[2] += deepest - depth + 1
+
+    def on_solution(moves):
+        # The last position of the solution is not searched
+        path.pop()
+
+    probe = SearchProbe(on_node, on_prune, on_solution, on_backtrack, fold_depth=0, node_limit=node_limit)
+    solution = next(probe_solutions(grid, start, probe), None)
+    n_moves = max(0, probe.nodes - 1)  # Every position but the start is reached by a move
+    stats = {"nodes": probe.nodes, "branching": n_moves / max(1, counts["searched"]),
+             "dead_ends": counts["dead_ends"], "wrong_moves": 0, "dead_end_depth": 0.0, "solution": solution}
+    if solution is not None:
+        # The path holds the positions of the solution path
+        stats["nodes"] = probe.first_solution_nodes
+        stats["wrong_moves"] = sum(entry[1] for entry in path)
+        stats["dead_end_depth"] = sum(entry[2] for entry in path) / max(1, stats["wrong_moves"])
+    return stats
+
+def count_forced_moves(grid, start, moves):
+    '''
+    Count the moves of a solution that are the only move left that is not a dead end
+    
+    *** Parameters ***
+        grid: list - The level grid of 'o' and 'x' strings
+        start: list - The start position [x, y] of the level
+        moves: str - The solution
+    
+    *** Returns ***
+        n_forced: int - The number of forced moves
+    '''
+    board = Bitboard(grid)
+    cell = board.index(start)
+    remaining = board.free & ~(1 << cell)
+    n_forced = 0
+    for move in moves:
+        n_open = 0
+        for _, n in board.neighbors[cell]:
+            if remaining >> n & 1:
+                rest = remaining & ~(1 << n)
+                n_open += not rest or not check_dead_end(board, n, rest)
+        n_forced += n_open == 1
+        cell = dict(board.neighbors[cell])[move]
+        remaining &= ~(1 << cell)
+    return n_forced
+
+def difficulty_score(stats):
+    '''
+    Combine the statistics of a level into one difficulty score.
+    Every choice of the player counts one point and every move of a wrong branch half a point.
+    Longer levels and levels that make the solver search more score higher.
+    The number of solutions is left out, so a level gets the same score whether its solutions were counted or not.
+    
+    *** Parameters ***
+        stats: dict - The statistics of analyze_level()
+    
+    *** Returns ***
+        score: float - The difficulty score, 0 for the easiest levels
+    '''
+    n_moves = stats["moves"]
+    score = (n_moves / 10 + (n_moves - stats["forced_moves"])
+             + stats["wrong_moves"] * stats["dead_end_depth"] / 2
+             + 3 * math.log2(stats["nodes"] / max(1, n_moves)))
+    return round(max(0.0, score), 2)
+
+def analyze_level(grid, start, count=True, node_limit=1000000):
+    '''
+    Measure the difficulty of a level
+    
+    *** Parameters ***
+        grid: list - The level grid of 'o' and 'x' strings
+        start: list - The start position [x, y] of the level
+        count: bool - Whether to count the solutions, which takes long on levels wider than 10 cells
+        node_limit: int - Stop the search of the first solution after this many positions
+    
+    *** Returns ***
+        difficulty: dict - The statistics of search_stats() without the solution, with the number
+            of moves of the solution, the forced moves, the number of solutions and the score.
+            None if the level has no solution or the node limit was reached.
+    '''
+    stats = search_stats(grid, start, node_limit)
+    moves = stats.pop("solution")
+    if moves is None:
+        return None
+    stats["moves"] = len(moves)
+    stats["forced_moves"] = count_forced_moves(grid, start, moves)
+    stats["solutions"] = count_solutions(grid, start) if count else None
+    stats["branching"] = round(stats["branching"], 3)
+    stats["dead_end_depth"] = round(stats["dead_end_depth"], 3)
+    stats["score"] = difficulty_score(stats)
+    return stats
+
+def star_times(difficulty):
+    '''
+    Get the times to get 3 and 2 stars on a level, scaled by its difficulty
+    
+    *** Parameters ***
+        difficulty: dict - The difficulty of the level from analyze_level(), None if it is unknown
+    
+    *** Returns ***
+        times: tuple - The longest completion times in s for 3 and for 2 stars
+    '''
+    if not difficulty:
+        return DEFAULT_STAR_TIMES
+    three_stars = max(MIN_STAR_TIME, round(SECONDS_PER_POINT * difficulty["score"]))
+    return three_stars, 2 * three_stars
+
+def rate_levels(levels, count=True, sort=False):
+    '''
+    Add the difficulty of every level of a pack to the level, as its "difficulty" entry
+    
+    *** Parameters ***
+        levels: list - The levels, in the format of levels.json
+        count: bool - Whether to count the solutions of every level
+        sort: bool - Whether to order the levels from the easiest to the hardest
+    
+    *** Returns ***
+        rated: list - The levels with their difficulty, None for the levels without a solution
+    '''
+    rated = [dict(level, difficulty=analyze_level(level["grid"], level["start"], count)) for level in levels]
+    if sort:
+        # Levels without a solution go last
+        rated.sort(key=lambda level: (level["difficulty"] is None, (level["difficulty"] or {}).get("score", 0)))
+    return rated
+
+def rate_main(argv):
+    '''
+    Command line entry point of the difficulty analyzer
+    
+    *** Parameters ***
+        argv: list - The command line arguments
+    
+    *** Returns ***
+        int - The exit status
+    '''
+    parser = argparse.ArgumentParser(description="Measure the difficulty of the levels of a pack.")
+    parser.add_argument('--rate', metavar='LEVELS', required=True, help="level pack, in the format of levels.json or binary")
+    parser.add_argument('--out', metavar='FILE', default='-', help="rated level pack output file (default: stdout)")
+    parser.add_argument('--no-count', action='store_true', help="do not count the solutions")
+    parser.add_argument('--sort', action='store_true', help="order the levels from the easiest to the hardest")
+    args = parser.parse_args(argv)
+
+    levels = load_levels(args.rate)
+    rated = rate_levels(levels, not args.no_count, args.sort)
+    out_file = sys.stdout if args.out == '-' else open(args.out, 'w')
+    try:
+        write_levels(rated, out_file)
+    finally:
+        if out_file is not sys.stdout:
+            out_file.close()
+    n_unsolvable = sum(level["difficulty"] is None for level in rated)
+    print(f"{len(rated) - n_unsolvable}/{len(rated)} levels rated.", file=sys.stderr)
+    return 0 if n_unsolvable == 0 else 1
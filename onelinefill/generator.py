@@ -0,0 +1,194 @@
+'''
+Generator of random levels that always have a solution.
+A random Hamiltonian path is grown over the whole grid, then a part of it is kept as the solution
+and the other cells are blocked.
+
+Usage: python -m onelinefill --generate 1000 --size 7x7 --density 0.1 --out pack.json
+'''
+
+import sys
+import random
+import argparse
+import multiprocessing
+from itertools import islice
+
+from .solver import iter_solutions
+from .levelio import write_levels
+
+def snake_path(height, width):
+    '''
+    Build the path that goes back and forth along the rows of a grid
+    
+    *** Parameters ***
+        height: int - The number of rows
+        width: int - The number of columns
+    
+    *** Returns ***
+        path: list - The (row, col) cells of the path
+    '''
+    path = []
+    for row in range(height):
+        cols = range(width) if row % 2 == 0 else range(width - 1, -1, -1)
+        path.extend((row, col) for col in cols)
+    return path
+
+def random_path(height, width, rng, n_steps=None):
+    '''
+    Grow a random Hamiltonian path over a full grid with backbite moves.
+    A backbite joins an end of the path to one of its grid neighbors and cuts the path next to
+    that neighbor, so the path always covers every cell and the walk can reach any such path.
+    
+    *** Parameters ***
+        height: int - The number of rows
+        width: int - The number of columns
+        rng: random.Random - The random number generator
+        n_steps: int - The number of backbite moves (None for 10 per cell)
+    
+    *** Returns ***
+        path: list - The (row, col) cells of the path
+    '''
+    path = snake_path(height, width)
+    if n_steps is None:
+        n_steps = 10 * height * width
+    # Position of every cell in the path
+    position = {cell: i for i, cell in enumerate(path)}
+    for _ in range(n_steps):
+        # Pick an end of the path and one of its grid neighbors
+        end = 0 if rng.random() < 0.5 else len(path) - 1
+        row, col = path[end]
+        d_row, d_col = rng.choice(((0, 1), (1, 0), (0, -1), (-1, 0)))
+        n_row, n_col = row + d_row, col + d_col
+        if not (0 <= n_row < height and 0 <= n_col < width):
+            continue
+        i = position[(n_row, n_col)]
+        if end == 0 and i > 1:
+            # Link the head to cell i and reverse the cells before it
+            path[:i] = path[i - 1::-1]
+            changed = range(i)
+        elif end > 0 and i < end - 1:
+            # Link the tail to cell i and reverse the cells after it
+            path[i + 1:] = path[:i:-1]
+            changed = range(i + 1, len(path))
+        else:
+            # The neighbor is already next to the end on the path
+            continue
+        for k in changed:
+            position[path[k]] = k
+    return path
+
+def generate_level(height, width, density=0.0, unique=False, rng=None):
+    '''
+    Generate a random level that has a solution.
+    Open grids almost always have several solutions, so for a unique level cells are removed from
+    the ends of the path until only one solution is left: it may have more blocked cells than asked.
+    
+    *** Parameters ***
+        height: int - The number of rows
+        width: int - The number of columns
+        density: float - The fraction of the cells that are blocked, from 0 to 1
+        unique: bool - Whether the level must have exactly one solution
+        rng: random.Random - The random number generator (None for a new one)
+    
+    *** Returns ***
+        level: dict - The level in the format of levels.json
+    '''
+    if rng is None:
+        rng = random.Random()
+    n_cells = height * width
+    n_keep = min(n_cells, max(2, round(n_cells * (1 - density))))
+    path = random_path(height, width, rng)
+    # Keep a random part of the path, the cells out of it are blocked
+    offset = rng.randint(0, n_cells - n_keep)
+    kept = path[offset:offset + n_keep]
+    if rng.random() < 0.5:
+        kept.reverse()
+    grid = [['x'] * width for _ in range(height)]
+    for row, col in kept:
+        grid[row][col] = 'o'
+    start = [kept[0][1], kept[0][0]]
+    # The kept path is one solution, block an end of it while there is another one
+    while unique and len(list(islice(iter_solutions(grid, start), 2))) > 1:
+        if rng.random() < 0.5:
+            row, col = kept.pop(0)
+            start = [kept[0][1], kept[0][0]]
+        else:
+            row, col = kept.pop()
+        grid[row][col] = 'x'
+    return {"grid": grid, "start": start}
+
+def generate_task(task):
+    '''
+    Generate one level in a worker process
+    
+    *** Parameters ***
+        task: tuple - (height, width, density, unique, seed)
+    
+    *** Returns ***
+        level: dict - The level
+    '''
+    height, width, density, unique, seed = task
+    return generate_level(height, width, density, unique, random.Random(seed))
+
+def generate_levels(n_levels, height, width, density=0.0, unique=False, seed=None, workers=None):
+    '''
+    Generate a level pack on a pool of processes.
+    Every level has its own seed, so the same seed gives the same pack with any number of processes.
+    
+    *** Parameters ***
+        n_levels: int - The number of levels
+        height: int - The number of rows
+        width: int - The number of columns
+        density: float - The fraction of the cells that are blocked, from 0 to 1
+        unique: bool - Whether the levels must have exactly one solution
+        seed: int - The seed of the pack (None for a random one)
+        workers: int - The number of processes (None for all the cores)
+    
+    *** Returns ***
+        levels: list - The levels, in the format of levels.json
+    '''
+    if seed is None:
+        seed = random.randrange(2 ** 32)
+    tasks = [(height, width, density, unique, seed + i) for i in range(n_levels)]
+    with multiprocessing.Pool(workers) as pool:
+        chunksize = max(1, n_levels // (4 * (workers or multiprocessing.cpu_count())))
+        levels = pool.map(generate_task, tasks, chunksize)
+    return levels
+
+def generate_main(argv):
+    '''
+    Command line entry point of the level generator
+    
+    *** Parameters ***
+        argv: list - The command line arguments
+    
+    *** Returns ***
+        int - The exit status
+    '''
+    parser = argparse.ArgumentParser(description="Generate a pack of random solvable levels.")
+    parser.add_argument('--generate', metavar='N', type=int, required=True, help="number of levels")
+    parser.add_argument('--size', default='7x7', help="size of the levels as ROWSxCOLS (default: 7x7)")
+    parser.add_argument('--density', type=float, default=0.1, help="fraction of blocked cells (default: 0.1)")
+    parser.add_argument('--unique', action='store_true', help="only keep levels with exactly one solution")
+    parser.add_argument('--seed', type=int, default=None, help="seed of the pack (default: random)")
+    parser.add_argument('--workers', type=int, default=None, help="number of processes (default: all cores)")
+    parser.add_argument('--out', metavar='FILE', default='-', help="level pack output file (default: stdout)")
+    args = parser.parse_args(argv)
+
+    try:
+        height, width = (int(n) for n in args.size.lower().split('x'))
+    except ValueError:
+        parser.error(f"invalid size: {args.size}")
+    if height < 1 or width < 1:
+        parser.error(f"invalid size: {args.size}")
+    if not 0 <= args.density < 1:
+        parser.error("the density must be at least 0 and less than 1")
+
+    levels = generate_levels(args.generate, height, width, args.density, args.unique, args.seed, args.workers)
+    out_file = sys.stdout if args.out == '-' else open(args.out, 'w')
+    try:
+        write_levels(levels, out_file)
+    finally:
+        if out_file is not sys.stdout:
+            out_file.close()
+    print(f"{len(levels)} levels generated.", file=sys.stderr)
+    return 0
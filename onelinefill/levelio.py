@@ -0,0 +1,18 @@
+'''
+Writing of level packs in the format of levels.json, without the solver or the other tools.
+'''
+
+import json
+
+def write_levels(levels, out_file):
+    '''
+    Write a level pack in the format of levels.json, one level per line
+    
+    *** Parameters ***
+        levels: list - The levels
+        out_file: file - The file to write the levels to
+    
+    *** Returns ***
+        None
+    '''
+    out_file.write('[\n' + ',\n'.join('    ' + json.dumps(level) for level in levels) + '\n]\n')
@@ -0,0 +1,186 @@
+'''
+Binary level packs, read through mmap so only the levels that are used are decoded.
+
+Layout, little-endian:
+    header: magic b'OLFP', version (u16), 0 (u16), number of levels (u32), offset of the index (u64)
+    records: for every level, height, width, start x and start y (u16 each), the free cells as a
+        bitmask of height * width bits (bit row * width + col, like the solver's Bitboard),
+        then the other entries of the level as JSON, if it has any
+    index: the offsets of the records (u64), followed by the end of the last record
+
+Usage: python -m onelinefill --pack levels.json --out levels.olf
+       python -m onelinefill --unpack levels.olf --out levels.json
+'''
+
+import sys
+import json
+import mmap
+import struct
+import argparse
+
+from .levelio import write_levels
+
+PACK_MAGIC = b'OLFP'
+PACK_VERSION = 1
+PACK_HEADER = struct.Struct('<4sHHIQ')
+RECORD_HEADER = struct.Struct('<HHHH')
+OFFSET = struct.Struct('<Q')
+
+def encode_level(level):
+    '''
+    Encode a level as a record of a pack
+    
+    *** Parameters ***
+        level: dict - The level in the format of levels.json
+    
+    *** Returns ***
+        bytes - The record
+    '''
+    grid, (x, y) = level["grid"], level["start"]
+    height, width = len(grid), len(grid[0])
+    mask = 0
+    for row in range(height):
+        for col in range(width):
+            if grid[row][col] != 'x':
+                mask |= 1 << (row * width + col)
+    record = RECORD_HEADER.pack(height, width, x, y) + mask.to_bytes((height * width + 7) // 8, 'little')
+    # Keep the other entries, like the difficulty of the level
+    extra = {key: value for key, value in level.items() if key not in ("grid", "start")}
+    if extra:
+        record += json.dumps(extra, separators=(',', ':')).encode()
+    return record
+
+def decode_level(record):
+    '''
+    Decode a record of a pack
+    
+    *** Parameters ***
+        record: bytes - The record
+    
+    *** Returns ***
+        level: dict - The level in the format of levels.json
+    '''
+    height, width, x, y = RECORD_HEADER.unpack_from(record)
+    mask_end = RECORD_HEADER.size + (height * width + 7) // 8
+    mask = int.from_bytes(record[RECORD_HEADER.size:mask_end], 'little')
+    grid = []
+    for row in range(height):
+        bits = mask >> (row * width)
+        grid.append(['o' if bits >> col & 1 else 'x' for col in range(width)])
+    level = {"grid": grid, "start": [x, y]}
+    if len(record) > mask_end:
+        level.update(json.loads(bytes(record[mask_end:])))
+    return level
+
+def write_pack(levels, path):
+    '''
+    Write levels to a binary pack, one at a time
+    
+    *** Parameters ***
+        levels: iterable - The levels, in the format of levels.json
+        path: str - The pack file
+    
+    *** Returns ***
+        n_levels: int - The number of levels written
+    '''
+    offsets = []
+    with open(path, 'wb') as file:
+        # The header is written again at the end, when the index offset is known
+        file.write(PACK_HEADER.pack(PACK_MAGIC, PACK_VERSION, 0, 0, 0))
+        offset = PACK_HEADER.size
+        for level in levels:
+            record = encode_level(level)
+            offsets.append(offset)
+            file.write(record)
+            offset += len(record)
+        offsets.append(offset)
+        for offset in offsets:
+            file.write(OFFSET.pack(offset))
+        file.seek(0)
+        file.write(PACK_HEADER.pack(PACK_MAGIC, PACK_VERSION, 0, len(offsets) - 1, offsets[-1]))
+    return len(offsets) - 1
+
+def is_pack(path):
+    '''Check whether a file is a binary level pack'''
+    with open(path, 'rb') as file:
+        return file.read(len(PACK_MAGIC)) == PACK_MAGIC
+
+class LevelPack:
+    '''
+    Read-only list of the levels of a binary pack.
+    The file is mapped in memory and a level is decoded only when it is accessed,
+    so opening a pack takes the same time and memory whatever its size.
+    
+    *** Parameters ***
+        path: str - The pack file
+    '''
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as file:
+            self.data = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        if len(self.data) < PACK_HEADER.size:
+            raise ValueError(f"{path} is not a level pack")
+        magic, version, _, self.n_levels, self.index_offset = PACK_HEADER.unpack_from(self.data)
+        if magic != PACK_MAGIC:
+            raise ValueError(f"{path} is not a level pack")
+        if version != PACK_VERSION:
+            raise ValueError(f"{path} has pack version {version}, expected {PACK_VERSION}")
+        if self.index_offset + (self.n_levels + 1) * OFFSET.size > len(self.data):
+            raise ValueError(f"{path} is truncated")
+
+    def __len__(self):
+        return self.n_levels
+
+    def __getitem__(self, index):
+        '''
+        Decode a level
+        
+        *** Parameters ***
+            index: int - The index of the level, negative indices count from the end
+        
+        *** Returns ***
+            level: dict - The level in the format of levels.json
+        '''
+        if index < 0:
+            index += self.n_levels
+        if not 0 <= index < self.n_levels:
+            raise IndexError("level index out of range")
+        begin, end = struct.unpack_from('<QQ', self.data, self.index_offset + index * OFFSET.size)
+        return decode_level(self.data[begin:end])
+
+    def close(self):
+        '''Unmap the file'''
+        self.data.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+def pack_main(argv):
+    '''
+    Command line entry point of the converters between JSON levels and binary packs
+    
+    *** Parameters ***
+        argv: list - The command line arguments
+    
+    *** Returns ***
+        int - The exit status
+    '''
+    parser = argparse.ArgumentParser(description="Convert levels between the JSON format and binary packs.")
+    group = parser.add_mutually_exclusive_group(required=True)
+    group.add_argument('--pack', metavar='LEVELS', help="JSON levels to write as a binary pack")
+    group.add_argument('--unpack', metavar='PACK', help="binary pack to write as JSON levels")
+    parser.add_argument('--out', metavar='FILE', required=True, help="output file")
+    args = parser.parse_args(argv)
+
+    if args.pack:
+        with open(args.pack, 'r') as file:
+            n_levels = write_pack(json.load(file), args.out)
+    else:
+        with LevelPack(args.unpack) as pack, open(args.out, 'w') as file:
+            write_levels(pack, file)
+            n_levels = len(pack)
+    print(f"{n_levels} levels converted.", file=sys.stderr)
+    return 0
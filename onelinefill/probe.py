@@ -0,0 +1,253 @@
+'''
+Instrumentation of the solver, to find out why a level is slow to solve.
+probe_solutions() is iter_solutions() with counters, timers and callbacks, so the solver itself
+runs without any of them. The search tree can be exported as folded stacks for flame graph tools
+(flamegraph.pl, speedscope) or as a JSON report.
+
+Usage: python -m onelinefill --profile levels.json --level 9 --json trace.json --folded trace.folded
+'''
+
+import sys
+import json
+import time
+import argparse
+
+from .board import load_levels
+from .solver import Bitboard, check_parity, check_dead_end
+
+# Reasons of check_dead_end() and of the checks at the start, by which the prunes are counted
+PRUNE_REASONS = ('degree', 'parity', 'connectivity')
+
+class SearchProbe:
+    '''
+    Counters and callbacks of a search run by probe_solutions().
+    The callbacks are optional and are called with the depth, the number of moves from the start.
+    
+    *** Parameters ***
+        on_node: function - Called with (depth, cell) for every position visited
+        on_prune: function - Called with (reason, depth, cell) for every position cut by the pruning
+        on_solution: function - Called with (moves) for every solution
+        on_backtrack: function - Called with (depth) for every position left after all its moves were tried
+        fold_depth: int - The number of first moves by which the positions are counted for folded stacks,
+            0 to not count them
+        node_limit: int - Stop the search after this many positions, None for no limit
+    
+    *** Attributes ***
+        nodes: int - The number of positions visited, the start included
+        prunes: dict - The number of positions cut, by reason
+        max_depth: int - The deepest position visited
+        backtracks: list - The number of positions left after all their moves were tried, by depth
+        solutions: int - The number of solutions found
+        first_solution_nodes: int - The number of positions visited up to the first solution, None before it
+        phases: dict - The time in s spent in each phase: 'setup' for the board and the checks at
+            the start, 'pruning' for check_dead_end() and 'search' for the rest of the search
+        subtrees: dict - The number of positions visited under each sequence of first moves
+    '''
+    def __init__(self, on_node=None, on_prune=None, on_solution=None, on_backtrack=None, fold_depth=4, node_limit=None):
+        self.on_node = on_node
+        self.on_prune = on_prune
+        self.on_solution = on_solution
+        self.on_backtrack = on_backtrack
+        self.fold_depth = fold_depth
+        self.node_limit = node_limit
+        self.nodes = 0
+        self.prunes = dict.fromkeys(PRUNE_REASONS, 0)
+        self.max_depth = 0
+        self.backtracks = []
+        self.solutions = 0
+        self.first_solution_nodes = None
+        self.phases = {'setup': 0.0, 'pruning': 0.0, 'search': 0.0}
+        self.subtrees = {}
+
+    def prune(self, reason, depth, cell):
+        '''Count a position cut by the pruning'''
+        self.prunes[reason] += 1
+        if self.on_prune is not None:
+            self.on_prune(reason, depth, cell)
+
+    def backtrack(self, depth):
+        '''Count a position left after all its moves were tried'''
+        while len(self.backtracks) <= depth:
+            self.backtracks.append(0)
+        self.backtracks[depth] += 1
+        if self.on_backtrack is not None:
+            self.on_backtrack(depth)
+
+    def report(self):
+        '''
+        Summarize the search
+        
+        *** Returns ***
+            report: dict - The counters and the phase times, ready to be written as JSON
+        '''
+        return {
+            "nodes": self.nodes,
+            "prunes": dict(self.prunes),
+            "max_depth": self.max_depth,
+            "backtracks": list(self.backtracks),
+            "solutions": self.solutions,
+            "first_solution_nodes": self.first_solution_nodes,
+            "phases": {phase: round(seconds, 6) for phase, seconds in self.phases.items()},
+        }
+
+    def write_json(self, out_file):
+        '''Write the report and the positions visited under each sequence of first moves as JSON'''
+        report = self.report()
+        report["subtrees"] = self.subtrees
+        json.dump(report, out_file, indent=4)
+        out_file.write('\n')
+
+    def write_folded(self, out_file):
+        '''
+        Write the positions visited under each sequence of first moves as folded stacks,
+        one 'start;R;D;... count' line per sequence, the input format of flame graph tools
+        '''
+        for prefix, count in sorted(self.subtrees.items()):
+            out_file.write(';'.join(('start',) + tuple(prefix)) + f" {count}\n")
+
+def probe_solutions(grid, start, probe):
+    '''
+    Generate the solutions of a level like iter_solutions(), measuring the search with a probe.
+    The time the caller spends between two solutions is not counted.
+    The search stops early when the node limit of the probe is reached.
+    
+    *** Parameters ***
+        grid: list - The level grid of 'o' and 'x' strings
+        start: list - The start position [x, y] of the level
+        probe: SearchProbe - The probe that measures the search
+    
+    *** Yields ***
+        moves: str - A solution as a move string of 'R', 'D', 'L' and 'U'
+    '''
+    clock = time.perf_counter
+    phases = probe.phases
+    on_node, on_solution = probe.on_node, probe.on_solution
+    fold_depth = probe.fold_depth
+    subtrees = probe.subtrees
+    node_limit = probe.node_limit
+
+    begin = clock()
+    board = Bitboard(grid)
+    neighbors = board.neighbors
+    start_cell = board.index(start)
+    if not board.free >> start_cell & 1:
+        phases['setup'] += clock() - begin
+        return
+    probe.nodes += 1
+    if on_node is not None:
+        on_node(0, start_cell)
+    if fold_depth:
+        subtrees[''] = subtrees.get('', 0) + 1
+    remaining = board.free & ~(1 << start_cell)
+    if not remaining:
+        phases['setup'] += clock() - begin
+        probe.solutions += 1
+        probe.first_solution_nodes = probe.nodes
+        if on_solution is not None:
+            on_solution('')
+        yield ''
+        return
+    if not check_parity(board, start_cell, remaining):
+        probe.prune('parity', 0, start_cell)
+        phases['setup'] += clock() - begin
+        return
+    reason = check_dead_end(board, start_cell, remaining)
+    phases['setup'] += clock() - begin
+    if reason:
+        probe.prune(reason, 0, start_cell)
+        return
+
+    begin = clock()
+    pruning = 0.0
+    stack = [[start_cell, 0]]
+    moves = []
+    while stack and (node_limit is None or probe.nodes < node_limit):
+        top = stack[-1]
+        cell_neighbors = neighbors[top[0]]
+        while top[1] < len(cell_neighbors) and not remaining >> cell_neighbors[top[1]][1] & 1:
+            top[1] += 1
+        if top[1] == len(cell_neighbors):
+            stack.pop()
+            probe.backtrack(len(stack))
+            if moves:
+                moves.pop()
+                remaining |= 1 << top[0]
+            continue
+
+        move, n = cell_neighbors[top[1]]
+        top[1] += 1
+        moves.append(move)
+        remaining ^= 1 << n
+        depth = len(moves)
+        probe.nodes += 1
+        if depth > probe.max_depth:
+            probe.max_depth = depth
+        if on_node is not None:
+            on_node(depth, n)
+        if fold_depth:
+            prefix = ''.join(moves[:fold_depth])
+            subtrees[prefix] = subtrees.get(prefix, 0) + 1
+        if not remaining:
+            probe.solutions += 1
+            if probe.first_solution_nodes is None:
+                probe.first_solution_nodes = probe.nodes
+            moves_str = ''.join(moves)
+            if on_solution is not None:
+                on_solution(moves_str)
+            # Stop the clocks while the caller has the solution
+            phases['search'] += clock() - begin - pruning
+            phases['pruning'] += pruning
+            yield moves_str
+            begin = clock()
+            pruning = 0.0
+            moves.pop()
+            remaining |= 1 << n
+            continue
+        check_begin = clock()
+        reason = check_dead_end(board, n, remaining)
+        pruning += clock() - check_begin
+        if reason:
+            probe.prune(reason, depth, n)
+            moves.pop()
+            remaining |= 1 << n
+            continue
+        stack.append([n, 0])
+    phases['search'] += clock() - begin - pruning
+    phases['pruning'] += pruning
+
+def profile_main(argv):
+    '''
+    Command line entry point of the solver profiler
+    
+    *** Parameters ***
+        argv: list - The command line arguments
+    
+    *** Returns ***
+        int - The exit status
+    '''
+    parser = argparse.ArgumentParser(description="Measure where the solver spends its time on a level.")
+    parser.add_argument('--profile', metavar='LEVELS', required=True, help="level pack, in the format of levels.json or binary")
+    parser.add_argument('--level', type=int, required=True, help="number of the level, from 1")
+    parser.add_argument('--max-solutions', type=int, default=None, help="stop after this many solutions (default: all)")
+    parser.add_argument('--fold-depth', type=int, default=4, help="first moves by which the positions are counted (default: 4)")
+    parser.add_argument('--json', metavar='FILE', default=None, help="JSON report output file")
+    parser.add_argument('--folded', metavar='FILE', default=None, help="folded stacks output file, for flame graph tools")
+    args = parser.parse_args(argv)
+
+    levels = load_levels(args.profile)
+    if not 1 <= args.level <= len(levels):
+        parser.error(f"the pack has levels 1 to {len(levels)}")
+    level = levels[args.level - 1]
+    probe = SearchProbe(fold_depth=args.fold_depth)
+    for n_solutions, _ in enumerate(probe_solutions(level["grid"], level["start"], probe), 1):
+        if n_solutions == args.max_solutions:
+            break
+    if args.json is not None:
+        with open(args.json, 'w') as file:
+            probe.write_json(file)
+    if args.folded is not None:
+        with open(args.folded, 'w') as file:
+            probe.write_folded(file)
+    json.dump(probe.report(), sys.stderr)
+    sys.stderr.write('\n')
+    return 0
@@ -0,0 +1,188 @@
+'''
+Crash-safe storage of the player's records.
+The records file is only replaced by an atomic rename, and new records are written by a background
+thread, first to an append-only journal that is merged into the file when the store is closed.
+'''
+
+import os
+import json
+import threading
+
+def write_atomic(path, text):
+    '''
+    Replace a file so that it holds either its old or its new content, even after a crash or a power loss
+    
+    *** Parameters ***
+        path: str - The file
+        text: str - The new content
+    
+    *** Returns ***
+        None
+    '''
+    # Each process has its own temporary file, so processes saving the same file do not mix their writes
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        with open(tmp_path, 'w') as file:
+            file.write(text)
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        # Do not leave the temporary file behind, also when the process is stopped
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    sync_directory(path)
+
+def sync_directory(path):
+    '''Flush the directory entry of a file to disk, where the system allows it'''
+    try:
+        fd = os.open(os.path.dirname(os.path.abspath(path)), os.O_RDONLY)
+    except OSError:
+        # Directories cannot be opened on Windows, where the rename is already durable
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+class RecordStore:
+    '''
+    Records of the player, saved without blocking the game.
+    put() only updates the records in memory and hands them to a writer thread, which waits for
+    a short delay to write the records that arrive together at once.
+    
+    *** Parameters ***
+        path: str - The records file
+        journal: bool - Whether to append new records to a journal file instead of rewriting the records file
+        delay: float - The time in s the writer waits for more records before writing
+    
+    *** Attributes ***
+        records: dict - The records, by level number as a string
+        corrupt_path: str - Where an unreadable records file was moved by load(), None if it was readable
+    '''
+    def __init__(self, path='game_data.json', journal=True, delay=0.5):
+        self.path = path
+        self.journal_path = path + '.journal' if journal else None
+        self.delay = delay
+        self.records = {}
+        self.corrupt_path = None
+        self.pending = []  # (key, record) pairs not written yet
+        self.condition = threading.Condition()
+        self.writer = None
+        self.closing = False
+
+    def load(self):
+        '''
+        Load the records file and replay the journal left by a session that did not close the store
+        
+        *** Returns ***
+            records: dict - The records
+        '''
+        records = {}
+        try:
+            with open(self.path, 'r') as file:
+                records = json.load(file)
+        except FileNotFoundError:
+            pass
+        except json.JSONDecodeError:
+            # Keep the damaged file for recovery instead of overwriting it
+            self.corrupt_path = self.path + '.corrupt'
+            os.replace(self.path, self.corrupt_path)
+        has_journal = False
+        if self.journal_path is not None:
+            try:
+                with open(self.journal_path, 'r') as file:
+                    has_journal = True
+                    for line in file:
+                        try:
+                            key, record = json.loads(line)
+                        except ValueError:
+                            # The last line may be cut by a crash
+                            break
+                        records[key] = record
+            except FileNotFoundError:
+                pass
+        with self.condition:
+            self.records = records
+        # Start the session with an empty journal, so new records do not follow a cut line
+        if has_journal:
+            self.compact()
+        return records
+
+    def put(self, key, record):
+        '''
+        Set a record and schedule it to be written
+        
+        *** Parameters ***
+            key: str - The level number
+            record: dict - The record of the level
+        
+        *** Returns ***
+            None
+        '''
+        with self.condition:
+            self.records[key] = record
+            self.pending.append((key, record))
+            self.condition.notify()
+        if self.writer is None:
+            self.writer = threading.Thread(target=self.run, daemon=True)
+            self.writer.start()
+
+    def run(self):
+        '''Write the pending records in the background until the store is closed'''
+        while True:
+            with self.condition:
+                while not self.pending and not self.closing:
+                    self.condition.wait()
+                if self.pending and not self.closing:
+                    # Wait a little for the records that follow
+                    self.condition.wait(self.delay)
+                batch, self.pending = self.pending, []
+                snapshot = dict(self.records)
+                closing = self.closing
+            if batch:
+                self.write(batch, snapshot)
+            if closing:
+                return
+
+    def write(self, batch, snapshot):
+        '''
+        Write a batch of records, to the journal or by replacing the records file
+        
+        *** Parameters ***
+            batch: list - The (key, record) pairs to write
+            snapshot: dict - All the records
+        
+        *** Returns ***
+            None
+        '''
+        if self.journal_path is None:
+            write_atomic(self.path, json.dumps(snapshot, indent=4))
+            return
+        with open(self.journal_path, 'a') as file:
+            file.write(''.join(json.dumps([key, record]) + '\n' for key, record in batch))
+            file.flush()
+            os.fsync(file.fileno())
+
+    def compact(self):
+        '''Write all the records to the records file and remove the journal'''
+        with self.condition:
+            snapshot = dict(self.records)
+        write_atomic(self.path, json.dumps(snapshot, indent=4))
+        if self.journal_path is not None and os.path.exists(self.journal_path):
+            os.remove(self.journal_path)
+
+    def close(self):
+        '''Write the pending records, merge the journal into the records file and stop the writer'''
+        if self.writer is not None:
+            with self.condition:
+                self.closing = True
+                self.condition.notify()
+            self.writer.join()
+            self.writer = None
+            self.closing = False
+            if self.journal_path is not None:
+                self.compact()
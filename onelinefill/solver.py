@@ -0,0 +1,471 @@
+'''
+Solver of the One Line Fill Puzzle.
+A level is searched as a Hamiltonian path from the start cell over a bitmask of the free cells.
+'''
+
+import random
+from itertools import islice
+
+# Moves of the solver, in the order they are tried: (move, d_row, d_col)
+DIRECTIONS = (('R', 0, 1), ('D', 1, 0), ('L', 0, -1), ('U', -1, 0))
+
+class Bitboard:
+    '''
+    Bitmask representation of a level grid used by the solver.
+    Cell (row, col) is stored as bit row * width + col.
+    
+    *** Parameters ***
+        grid: list - The level grid of 'o' and 'x' strings
+    
+    *** Attributes ***
+        height: int - The number of rows
+        width: int - The number of columns
+        free: int - The bitmask of the cells that can be filled
+        neighbors: list - For every cell, a tuple of (move, cell) pairs of the free neighbors
+        neighbor_masks: list - For every cell, the bitmask of the free neighbors
+        not_first_col: int - The bitmask of the cells that are not in the first column
+        not_last_col: int - The bitmask of the cells that are not in the last column
+        even: int - The bitmask of the cells with an even row + col (checkerboard colouring)
+    '''
+    def __init__(self, grid):
+        self.height = len(grid)
+        self.width = len(grid[0])
+        self.free = 0
+        self.not_first_col = 0
+        self.not_last_col = 0
+        self.even = 0
+        for row in range(self.height):
+            for col in range(self.width):
+                bit = 1 << (row * self.width + col)
+                if grid[row][col] == 'o':
+                    self.free |= bit
+                if col > 0:
+                    self.not_first_col |= bit
+                if col < self.width - 1:
+                    self.not_last_col |= bit
+                if (row + col) % 2 == 0:
+                    self.even |= bit
+
+        # Precompute the free neighbors of every cell
+        self.neighbors = []
+        self.neighbor_masks = []
+        for row in range(self.height):
+            for col in range(self.width):
+                cell_neighbors = []
+                mask = 0
+                for move, d_row, d_col in DIRECTIONS:
+                    n_row, n_col = row + d_row, col + d_col
+                    if 0 <= n_row < self.height and 0 <= n_col < self.width:
+                        n = n_row * self.width + n_col
+                        if self.free >> n & 1:
+                            cell_neighbors.append((move, n))
+                            mask |= 1 << n
+                self.neighbors.append(tuple(cell_neighbors))
+                self.neighbor_masks.append(mask)
+
+    def index(self, start):
+        '''
+        Convert a start position of the level file to a cell index
+        
+        *** Parameters ***
+            start: list - The start position [x, y] of the level
+        
+        *** Returns ***
+            int - The cell index
+        '''
+        x, y = start
+        return y * self.width + x
+
+    def expand(self, mask, region):
+        '''
+        Grow a set of cells by one step in all four directions, inside a region
+        
+        *** Parameters ***
+            mask: int - The bitmask of the cells to grow
+            region: int - The bitmask of the cells that may be reached
+        
+        *** Returns ***
+            int - The bitmask of the grown set
+        '''
+        return (mask | (mask & self.not_last_col) << 1 | (mask & self.not_first_col) >> 1
+                | mask << self.width | mask >> self.width) & region
+
+def check_parity(board, head, remaining):
+    '''
+    Check the checkerboard colouring of the remaining cells.
+    Every move changes the colour, so a path from the head over the remaining cells
+    must visit ceil(n/2) cells of the other colour and floor(n/2) of its own.
+    The condition is kept by every move, so it only has to be checked at the root.
+    
+    *** Parameters ***
+        board: Bitboard - The board
+        head: int - The current cell
+        remaining: int - The bitmask of the cells that are not filled yet
+    
+    *** Returns ***
+        bool - True if the colours allow a path, False otherwise
+    '''
+    own = board.even if board.even >> head & 1 else ~board.even
+    n = remaining.bit_count()
+    return (remaining & own).bit_count() == n // 2
+
+def check_dead_end(board, head, remaining):
+    '''
+    Check whether the remaining cells can no longer be filled from the head
+    
+    *** Parameters ***
+        board: Bitboard - The board
+        head: int - The current cell
+        remaining: int - The bitmask of the cells that are not filled yet (not empty)
+    
+    *** Returns ***
+        reason: str - 'degree', 'parity' or 'connectivity' if the position is dead, None otherwise
+    '''
+    width = board.width
+    region = remaining | 1 << head
+    # For every remaining cell, whether it has a free neighbor in each direction
+    right = remaining & region >> 1 & board.not_last_col
+    left = remaining & region << 1 & board.not_first_col
+    down = remaining & region >> width
+    up = remaining & region << width
+    at_least_1 = right | left | down | up
+    if at_least_1 != remaining:
+        # A cell without any free neighbor
+        return 'degree'
+    at_least_2 = (right & left) | (right & down) | (right & up) | (left & down) | (left & up) | (down & up)
+    ends = at_least_1 & ~at_least_2
+    if ends:
+        # Each cell with a single free neighbor has to be the end of the path
+        if ends & (ends - 1):
+            return 'degree'
+        # The last cell has the colour of the head when an even number of cells remain
+        own = board.even if board.even >> head & 1 else ~board.even
+        if bool(ends & own) != (remaining.bit_count() % 2 == 0):
+            return 'parity'
+
+    # All remaining cells must be reachable from the head
+    reach = board.neighbor_masks[head] & remaining
+    while True:
+        grown = board.expand(reach, remaining)
+        if grown == reach:
+            break
+        reach = grown
+    if reach != remaining:
+        return 'connectivity'
+    return None
+
+def iter_solutions(grid, start):
+    '''
+    Generate the solutions of a level one by one with an iterative depth-first search over the bitboard.
+    The search is paused between solutions, so only the solutions that are used are computed.
+    
+    *** Parameters ***
+        grid: list - The level grid of 'o' and 'x' strings
+        start: list - The start position [x, y] of the level
+    
+    *** Yields ***
+        moves: str - A solution as a move string of 'R', 'D', 'L' and 'U'
+    '''
+    board = Bitboard(grid)
+    neighbors = board.neighbors
+    start_cell = board.index(start)
+    if not board.free >> start_cell & 1:
+        return
+
+    remaining = board.free & ~(1 << start_cell)
+    if not remaining:
+        yield ''
+        return
+    if not check_parity(board, start_cell, remaining) or check_dead_end(board, start_cell, remaining):
+        return
+
+    # Explicit stack of (cell, index of the next neighbor to try)
+    stack = [[start_cell, 0]]
+    moves = []
+    while stack:
+        top = stack[-1]
+        cell_neighbors = neighbors[top[0]]
+        # Look for the next free neighbor
+        while top[1] < len(cell_neighbors) and not remaining >> cell_neighbors[top[1]][1] & 1:
+            top[1] += 1
+        if top[1] == len(cell_neighbors):
+            # Dead end, backtrack
+            stack.pop()
+            if moves:
+                moves.pop()
+                remaining |= 1 << top[0]
+            continue
+
+        move, n = cell_neighbors[top[1]]
+        top[1] += 1
+        moves.append(move)
+        remaining ^= 1 << n
+        if not remaining:
+            # All cells are filled
+            yield ''.join(moves)
+            moves.pop()
+            remaining |= 1 << n
+            continue
+        if check_dead_end(board, n, remaining):
+            # Cut the subtree
+            moves.pop()
+            remaining |= 1 << n
+            continue
+        stack.append([n, 0])
+
+def solve(grid, start, max_solutions=3):
+    '''
+    Find the solutions of a level
+    
+    *** Parameters ***
+        grid: list - The level grid of 'o' and 'x' strings
+        start: list - The start position [x, y] of the level
+        max_solutions: int - Stop after finding this many solutions (None for all)
+    
+    *** Returns ***
+        solutions: list - The solutions as move strings of 'R', 'D', 'L' and 'U'
+    '''
+    return list(islice(iter_solutions(grid, start), max_solutions))
+
+def order_moves(board, cell, remaining, rng=None):
+    '''
+    Order the moves from a cell by Warnsdorff's rule: the neighbor with the fewest free neighbors
+    of its own goes first, so cells that are about to be cut off are filled while they still can be.
+    A neighbor with a single free neighbor left is a forced move. Ties go to the cells along the walls
+    and the blocked cells, which are harder to reach later, then to the random number generator.
+    
+    *** Parameters ***
+        board: Bitboard - The board
+        cell: int - The current cell
+        remaining: int - The bitmask of the cells that are not filled yet, the current cell excluded
+        rng: random.Random - Breaks the ties at random (None to keep the order of DIRECTIONS)
+    
+    *** Returns ***
+        moves: list - The (move, cell) pairs of the free neighbors, in the order to try them
+    '''
+    neighbor_masks = board.neighbor_masks
+    keyed = []
+    for move, n in board.neighbors[cell]:
+        if remaining >> n & 1:
+            onward = (neighbor_masks[n] & remaining).bit_count()
+            walls = neighbor_masks[n].bit_count()
+            keyed.append((onward, walls, rng.random() if rng else 0, move, n))
+    keyed.sort()
+    return [(move, n) for _, _, _, move, n in keyed]
+
+def heuristic_solution(grid, start, node_limit=100000, restart_nodes=None, seed=0):
+    '''
+    Find one solution of a level quickly, for when only one is needed.
+    The moves are tried in the order of order_moves(). A search that visits restart_nodes positions
+    without a solution is stuck under a bad early move, so it is restarted with the ties broken at
+    random and twice the positions, until node_limit positions are visited in all.
+    
+    *** Parameters ***
+        grid: list - The level grid of 'o' and 'x' strings
+        start: list - The start position [x, y] of the level
+        node_limit: int - Give up after this many positions in all the searches
+        restart_nodes: int - The positions of the first search (None for 10 per free cell)
+        seed: int - The seed of the random ties of the restarts
+    
+    *** Returns ***
+        moves: str - A solution, None if the level has no solution or the node limit was reached
+    '''
+    board = Bitboard(grid)
+    start_cell = board.index(start)
+    if not board.free >> start_cell & 1:
+        return None
+    remaining = board.free & ~(1 << start_cell)
+    if not remaining:
+        return ''
+    if not check_parity(board, start_cell, remaining) or check_dead_end(board, start_cell, remaining):
+        return None
+
+    return heuristic_search(board, start_cell, remaining, node_limit, restart_nodes, seed)
+
+def heuristic_search(board, head, remaining, node_limit=100000, restart_nodes=None, seed=0):
+    '''
+    Search one path from a position over the remaining cells with the restarts of heuristic_solution()
+    
+    *** Parameters ***
+        board: Bitboard - The board
+        head: int - The current cell
+        remaining: int - The bitmask of the cells that are not filled yet (not empty), which must pass
+            check_parity() and check_dead_end() from the head
+        node_limit: int - Give up after this many positions in all the searches
+        restart_nodes: int - The positions of the first search (None for 10 per cell of the path)
+        seed: int - The seed of the random ties of the restarts
+    
+    *** Returns ***
+        moves: str - The moves of the path, None if there is none or the node limit was reached
+    '''
+    start_remaining = remaining
+    budget = restart_nodes or 10 * (remaining.bit_count() + 1)
+    rng = None
+    while node_limit > 0:
+        budget = min(budget, node_limit)
+        nodes = 0
+        stack = [(head, iter(order_moves(board, head, remaining, rng)))]
+        moves = []
+        while stack and nodes < budget:
+            cell, ordered = stack[-1]
+            move, n = next(ordered, (None, None))
+            if move is None:
+                # Dead end, backtrack
+                stack.pop()
+                if moves:
+                    moves.pop()
+                    remaining |= 1 << cell
+                continue
+            nodes += 1
+            moves.append(move)
+            remaining ^= 1 << n
+            if not remaining:
+                return ''.join(moves)
+            if check_dead_end(board, n, remaining):
+                moves.pop()
+                remaining |= 1 << n
+                continue
+            stack.append((n, iter(order_moves(board, n, remaining, rng))))
+        if not stack:
+            # The search was complete, there is no solution
+            return None
+        # Restart from the head
+        remaining = start_remaining
+        node_limit -= nodes
+        budget *= 2
+        if rng is None:
+            rng = random.Random(seed)
+    return None
+
+def count_solutions(grid, start):
+    '''
+    Count all the solutions of a level with a frontier (broken profile) dynamic program.
+    Cells are processed row by row. The state is the set of path edges crossing the frontier
+    between processed and unprocessed cells, labelled by which edges are joined by the same
+    path segment, so all the partial paths with the same frontier are counted at once.
+    
+    *** Parameters ***
+        grid: list - The level grid of 'o' and 'x' strings
+        start: list - The start position [x, y] of the level
+    
+    *** Returns ***
+        int - The number of solutions
+    '''
+    height, width = len(grid), len(grid[0])
+    start_x, start_y = start
+    if grid[start_y][start_x] != 'o':
+        return 0
+    if sum(row.count('o') for row in grid) == 1:
+        return 1
+    # Use the narrow side of the grid as the frontier
+    if width > height:
+        grid = [list(col) for col in zip(*grid)]
+        height, width = width, height
+        start_x, start_y = start_y, start_x
+    free = [[cell == 'o' for cell in row] for row in grid]
+
+    # Labels of the edges: 0 for no edge, 1 for a segment that leads to an end of the path,
+    # and equal labels > 1 for the two edges of a segment that is open at both sides
+    NEW_LABEL = -1
+
+    def add(states, plugs, end_used, count):
+        # Renumber the labels in order of appearance so equal states are merged
+        labels = {0: 0, 1: 1}
+        key = tuple(labels.setdefault(p, len(labels)) for p in plugs)
+        states[(key, end_used)] = states.get((key, end_used), 0) + count
+
+    def relabel(plugs, old, new):
+        return [new if p == old else p for p in plugs]
+
+    # plugs[col] is the edge entering the cell from the left and plugs[col + 1] the edge from above.
+    # After the cell is processed they are the edges leaving it downwards and to the right.
+    # end_used tells whether the end of the path (the other end is the start) is placed.
+    states = {((0,) * (width + 1), 0): 1}
+    for row in range(height):
+        for col in range(width):
+            new_states = {}
+            is_start = row == start_y and col == start_x
+            can_down = row + 1 < height and free[row + 1][col]
+            can_right = col + 1 < width and free[row][col + 1]
+            for (plugs, end_used), count in states.items():
+                left, up = plugs[col], plugs[col + 1]
+                if not free[row][col]:
+                    if not left and not up:
+                        add(new_states, plugs, end_used, count)
+                    continue
+                p = list(plugs)
+                p[col] = p[col + 1] = 0
+                # An end of the path is allowed at the start and at one other cell
+                can_end = is_start or not end_used
+                used = end_used if is_start else 1
+                if left and up:
+                    # Join the two segments, without closing a loop
+                    if is_start or (left == up and left != 1):
+                        continue
+                    if left == 1 and up == 1:
+                        # The path is complete, no other segment may be left
+                        if not any(p):
+                            add(new_states, p, end_used, count)
+                    elif left == 1 or up == 1:
+                        add(new_states, relabel(p, up if left == 1 else left, 1), end_used, count)
+                    else:
+                        add(new_states, relabel(p, up, left), end_used, count)
+                elif left or up:
+                    label = left or up
+                    if not is_start:
+                        # Continue the segment
+                        if can_down:
+                            q = p[:]
+                            q[col] = label
+                            add(new_states, q, end_used, count)
+                        if can_right:
+                            q = p[:]
+                            q[col + 1] = label
+                            add(new_states, q, end_used, count)
+                    if can_end:
+                        # End the segment here
+                        if label != 1:
+                            add(new_states, relabel(p, label, 1), used, count)
+                        elif not any(p):
+                            add(new_states, p, used, count)
+                else:
+                    if not is_start and can_down and can_right:
+                        # Start a segment open at both sides
+                        q = p[:]
+                        q[col] = q[col + 1] = NEW_LABEL
+                        add(new_states, q, end_used, count)
+                    if can_end:
+                        # Start a segment from an end of the path
+                        if can_down:
+                            q = p[:]
+                            q[col] = 1
+                            add(new_states, q, used, count)
+                        if can_right:
+                            q = p[:]
+                            q[col + 1] = 1
+                            add(new_states, q, used, count)
+            states = new_states
+        # Move to the next row, no edge may leave the last column to the right
+        states = {((0,) + plugs[:width], end_used): count
+                  for (plugs, end_used), count in states.items() if not plugs[width]}
+    return states.get(((0,) * (width + 1), 1), 0)
+
+def moves_to_path(start, moves):
+    '''
+    Convert a move string to the list of visited cells
+    
+    *** Parameters ***
+        start: list - The start position [x, y] of the level
+        moves: str - The moves of the solution
+    
+    *** Returns ***
+        path: list - The visited (x, y) positions, starting with the start position
+    '''
+    steps = {move: (d_col, d_row) for move, d_row, d_col in DIRECTIONS}
+    x, y = start
+    path = [(x, y)]
+    for move in moves:
+        dx, dy = steps[move]
+        x, y = x + dx, y + dy
+        path.append((x, y))
+    return path
@@ -0,0 +1,109 @@
+'''
+The 8 symmetries (rotations and mirrors) of a level, used to solve each level only once
+for all its rotated and mirrored copies.
+'''
+
+from .solver import DIRECTIONS
+
+def transform_point(x, y, width, height, t):
+    '''
+    Apply one of the 8 symmetries of the grid to a position.
+    Bit 4 of t transposes the grid, then bit 1 mirrors it horizontally and bit 2 vertically.
+    
+    *** Parameters ***
+        x: int - The x-coordinate
+        y: int - The y-coordinate
+        width: int - The width of the grid before the transform
+        height: int - The height of the grid before the transform
+        t: int - The symmetry, 0 to 7
+    
+    *** Returns ***
+        (x, y): tuple - The transformed position
+    '''
+    if t & 4:
+        x, y, width, height = y, x, height, width
+    if t & 1:
+        x = width - 1 - x
+    if t & 2:
+        y = height - 1 - y
+    return x, y
+
+def inverse_transform(t):
+    '''
+    Find the symmetry that undoes t
+    
+    *** Parameters ***
+        t: int - The symmetry, 0 to 7
+    
+    *** Returns ***
+        int - The inverse symmetry
+    '''
+    # Mirroring before a transpose is the other mirror after it
+    if t & 4 and (t & 1) != (t & 2) >> 1:
+        return t ^ 3
+    return t
+
+def transform_level(grid, start, t):
+    '''
+    Apply a symmetry to a level
+    
+    *** Parameters ***
+        grid: list - The level grid of 'o' and 'x' strings
+        start: list - The start position [x, y] of the level
+        t: int - The symmetry, 0 to 7
+    
+    *** Returns ***
+        (grid, start): tuple - The transformed grid and start position
+    '''
+    height, width = len(grid), len(grid[0])
+    new_width, new_height = (height, width) if t & 4 else (width, height)
+    new_grid = [[None] * new_width for _ in range(new_height)]
+    for y, row in enumerate(grid):
+        for x, cell in enumerate(row):
+            new_x, new_y = transform_point(x, y, width, height, t)
+            new_grid[new_y][new_x] = cell
+    return new_grid, list(transform_point(start[0], start[1], width, height, t))
+
+def transform_moves(moves, t):
+    '''
+    Apply a symmetry to the moves of a solution
+    
+    *** Parameters ***
+        moves: str - The moves of the solution
+        t: int - The symmetry, 0 to 7
+    
+    *** Returns ***
+        str - The transformed moves
+    '''
+    vectors = {move: (d_col, d_row) for move, d_row, d_col in DIRECTIONS}
+    letters = {vector: move for move, vector in vectors.items()}
+    table = {}
+    for move, (dx, dy) in vectors.items():
+        if t & 4:
+            dx, dy = dy, dx
+        if t & 1:
+            dx = -dx
+        if t & 2:
+            dy = -dy
+        table[ord(move)] = letters[(dx, dy)]
+    return moves.translate(table)
+
+def canonical_level(grid, start):
+    '''
+    Map a level to its normal form under the 8 symmetries of the grid,
+    so that rotated and mirrored copies of a level share one solve
+    
+    *** Parameters ***
+        grid: list - The level grid of 'o' and 'x' strings
+        start: list - The start position [x, y] of the level
+    
+    *** Returns ***
+        (grid, start, t): tuple - The canonical grid and start, and the symmetry that maps the level to them
+    '''
+    best = None
+    for t in range(8):
+        new_grid, new_start = transform_level(grid, start, t)
+        text = ('/'.join(''.join('x' if cell == 'x' else 'o' for cell in row) for row in new_grid), new_start)
+        if best is None or text < best[0]:
+            best = (text, new_grid, new_start, t)
+    return best[1], best[2], best[3]